@@ -1,5 +1,7 @@
+import os
 from flask import Flask
 from src.flask_app.routes import routes
+from src.flask_app.preload import preload
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -7,5 +9,11 @@ app = Flask(__name__)
 # Register Blueprint
 app.register_blueprint(routes)
 
+# Clients and models are created on first use; production can build them up front instead
+preload(
+    clients=os.environ.get("PRELOAD_CLIENTS", "0") == "1",
+    models=os.environ.get("PRELOAD_MODELS", "0") == "1"
+)
+
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001, debug=True)
@@ -34,9 +34,21 @@ oauth2Client.setCredentials({
   refresh_token: REFRESH_TOKEN,
 });
 
-// function to like an image and unlike an image
-async function likeImage(imageId) {
+// function to like an image and unlike an image; pass isLiked to set the
+// state with a single write instead of reading the document first
+async function likeImage(imageId, isLiked) {
   const imageRef = db.collection("Images").doc(imageId);
+  if (typeof isLiked === "boolean") {
+    try {
+      await imageRef.update({ isLiked });
+      console.log(isLiked ? "Image liked" : "Image unliked");
+    } catch (error) {
+      // 5 is gRPC NOT_FOUND
+      if (error.code !== 5) throw error;
+      console.log("No such document!");
+    }
+    return;
+  }
   const doc = await imageRef.get();
   if (!doc.exists) {
     console.log("No such document!");
@@ -0,0 +1,57 @@
+import argparse
+import subprocess
+import sys
+
+# Each statement runs in a fresh interpreter so module caches do not hide import cost
+_IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [name for name in ("torch", "transformers", "cv2", "matplotlib") if name in sys.modules]
+print(f"{{elapsed:.4f}} {{','.join(heavy) or '-'}}")
+"""
+
+def benchmark_import(statement, repeats=5):
+    """
+    Measure how long a statement takes in a fresh interpreter.
+
+    Args:
+        statement (str): Python statement to time, e.g. an import.
+        repeats (int): Number of fresh interpreters; the best time is kept.
+
+    Returns:
+        tuple: (best seconds, heavy modules the statement pulled in).
+    """
+    best, heavy = float("inf"), "-"
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(statement=statement)],
+            check=True, capture_output=True, text=True
+        ).stdout.split()
+        if float(output[0]) < best:
+            best, heavy = float(output[0]), output[1]
+    return best, heavy
+
+def benchmark_startup(repeats=5):
+    """Report the import cost of the Flask app and of the ML pipeline it loads lazily."""
+    statements = {
+        "routes": "import src.flask_app.routes",
+        "server": "import server",
+        "ml_pipeline": "import src.ml_module.main",
+    }
+    results = {}
+    for name, statement in statements.items():
+        try:
+            results[name] = benchmark_import(statement, repeats)
+            print(f"{name}: {results[name][0] * 1000:.1f} ms (heavy modules: {results[name][1]})")
+        except subprocess.CalledProcessError as e:
+            print(f"{name}: failed to import\n{e.stderr}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API import and startup cost.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark_startup(args.repeats)
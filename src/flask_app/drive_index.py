@@ -0,0 +1,108 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Local index of files we know are in Drive, keyed by content hash (MD5, as Drive reports it) and name
+DRIVE_INDEX_PATH = os.environ.get("DRIVE_INDEX_PATH", "drive_index.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    folder_id TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    web_view_link TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_hash ON files (content_hash, folder_id);
+CREATE INDEX IF NOT EXISTS files_name ON files (name, folder_id);
+"""
+
+_COLUMNS = ("file_id", "name", "folder_id", "content_hash", "size", "web_view_link", "indexed_at")
+
+_connection = None
+_lock = threading.Lock()
+
+def _db():
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(DRIVE_INDEX_PATH, check_same_thread=False)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+def _row_to_dict(row):
+    return dict(zip(_COLUMNS, row)) if row else None
+
+def record_file(file_id, name, folder_id, content_hash=None, size=None, web_view_link=None):
+    """
+    Add or update a file in the index.
+
+    Args:
+        file_id (str): Drive file id.
+        name (str): File name in Drive.
+        folder_id (str): Parent folder id.
+        content_hash (str): Hex MD5 of the contents.
+        size (int): Size in bytes.
+        web_view_link (str): Drive link for the file.
+    """
+    with _lock:
+        db = _db()
+        db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (file_id, name, folder_id, content_hash, size, web_view_link, time.time())
+        )
+        db.commit()
+
+def find_by_hash(content_hash, folder_id=None):
+    """Return the indexed file with these contents (optionally in a folder), or None."""
+    query = "SELECT * FROM files WHERE content_hash = ?"
+    params = [content_hash]
+    if folder_id is not None:
+        query += " AND folder_id = ?"
+        params.append(folder_id)
+    with _lock:
+        return _row_to_dict(_db().execute(query + " LIMIT 1", params).fetchone())
+
+def find_by_name(name, folder_id=None):
+    """Return the indexed file with this name (optionally in a folder), or None."""
+    query = "SELECT * FROM files WHERE name = ?"
+    params = [name]
+    if folder_id is not None:
+        query += " AND folder_id = ?"
+        params.append(folder_id)
+    with _lock:
+        return _row_to_dict(_db().execute(query + " LIMIT 1", params).fetchone())
+
+def remove_file(file_id):
+    with _lock:
+        db = _db()
+        db.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        db.commit()
+
+def reconcile_folder(folder_id, files):
+    """
+    Make the index for a folder match a full Drive listing of it.
+
+    Args:
+        folder_id (str): Drive folder id.
+        files (iterable): File resources with 'id', 'name' and optionally
+            'md5Checksum', 'size' and 'webViewLink'.
+
+    Returns:
+        int: Number of files now indexed for the folder.
+    """
+    now = time.time()
+    rows = [
+        (f["id"], f["name"], folder_id, f.get("md5Checksum"),
+         int(f["size"]) if f.get("size") is not None else None, f.get("webViewLink"), now)
+        for f in files
+    ]
+    with _lock:
+        db = _db()
+        with db:
+            db.execute("DELETE FROM files WHERE folder_id = ?", (folder_id,))
+            db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
@@ -1,80 +1,499 @@
+import hashlib
+import io
+import json
+import mimetypes
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import httplib2
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.http import build_http, MediaFileUpload, MediaIoBaseDownload, MediaIoBaseUpload, MediaUpload
+from . import drive_index
+from .cache_utils import TTLCache
 
 
 
 # Constants
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 SERVICE_ACCOUNT_FILE = 'credentials/service-account.json'
+DRIVE_API_ENDPOINT = os.environ.get('DRIVE_API_ENDPOINT')  # Override to point at a fake Drive server
+UPLOAD_WORKERS = 8
+REQUEST_RETRIES = 5  # Retries with exponential backoff on 429/5xx
+UPLOAD_CHUNK_SIZE = 8 * 256 * 1024  # Resumable chunks must be a multiple of 256 KiB
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+RANGE_DOWNLOAD_THRESHOLD = 16 * 1024 * 1024  # Files larger than this are fetched as parallel ranges
+RANGE_WORKERS = 4
+LIST_PAGE_SIZE = 100
+LIST_FIELDS = 'nextPageToken, files(id, name)'
+LIST_CACHE_TTL = 60  # seconds
+LIST_CACHE_FOLDERS = 256
+METADATA_FIELDS = 'id, name, webViewLink, mimeType, size'
+METADATA_CACHE_TTL = 300  # seconds
+METADATA_CACHE_ITEMS = 4096
+BATCH_REQUEST_LIMIT = 100  # Maximum calls per Drive batch HTTP request
+DRIVE_CLIENT_POOL_SIZE = 16  # Idle Drive clients kept for reuse
 
-# Authenticate Google Drive API
-credentials = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-drive_service = build('drive', 'v3', credentials=credentials)
+# Google Drive API credentials and client, created on first use
+_credentials = None
+_drive_service = None
+_init_lock = threading.Lock()
 
-def check_file_exists(file_name):
-    """Check if a file with the given name exists in Google Drive."""
+def get_credentials():
+    """Return the service account credentials, loading them on first use."""
+    global _credentials
+    if _credentials is None:
+        with _init_lock:
+            if _credentials is None:
+                _credentials = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+    return _credentials
+
+def _build_service(**kwargs):
+    """Build a Drive client, pointed at DRIVE_API_ENDPOINT when it is set."""
+    if not DRIVE_API_ENDPOINT:
+        return build('drive', 'v3', cache_discovery=False, **kwargs)
+
+    # client_options' api_endpoint only moves the metadata calls; uploads and
+    # batch requests are built from rootUrl, so override that in the document
+    document = json.loads(get_static_doc('drive', 'v3'))
+    document['rootUrl'] = DRIVE_API_ENDPOINT.rstrip('/') + '/'
+    document['baseUrl'] = document['rootUrl'] + document['servicePath']
+    return build_from_document(document, **kwargs)
+
+def get_drive_service():
+    """Return the shared Drive client, building it on first use."""
+    global _drive_service
+    if _drive_service is None:
+        credentials = get_credentials()
+        with _init_lock:
+            if _drive_service is None:
+                _drive_service = _build_service(credentials=credentials)
+    return _drive_service
+
+# Folder listings keyed by folder id; our own uploads invalidate the folder they write to
+_listing_cache = TTLCache(max_items=LIST_CACHE_FOLDERS, ttl=LIST_CACHE_TTL)
+
+# File metadata keyed by file id, plus fetches currently in flight so concurrent misses share one call
+_metadata_cache = TTLCache(max_items=METADATA_CACHE_ITEMS, ttl=METADATA_CACHE_TTL)
+_metadata_inflight = {}
+_metadata_lock = threading.Lock()
+
+# Idle Drive clients, each with its own authorized, persistent http connection. The
+# shared client's http object is not thread-safe, so each call checks one out; the
+# clients outlive the threads using them (Flask's dev server starts one per request)
+_service_pool = queue.LifoQueue()
+
+def _new_service():
+    # build_http stops httplib2 from treating the resumable upload's 308 as a redirect
+    http = AuthorizedHttp(get_credentials(), http=build_http())
+    return _build_service(http=http)
+
+@contextmanager
+def _pooled_service():
+    """Check a Drive client out of the pool for one call, building one if none is idle."""
     try:
-        query = f"name='{file_name}' and trashed=false"
-        results = drive_service.files().list(q=query).execute()
-        return len(results.get('files', [])) > 0
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+        service = _service_pool.get_nowait()
+    except queue.Empty:
+        service = _new_service()
+    try:
+        yield service
+    finally:
+        if _service_pool.qsize() < DRIVE_CLIENT_POOL_SIZE:
+            _service_pool.put(service)
+
+def check_file_exists(file_name, folder_id=None):
+    """Check the local Drive index for a file with the given name."""
+    return drive_index.find_by_name(file_name, folder_id) is not None
+
+def find_duplicate(content_hash, folder_id=None):
+    """Return the indexed Drive file with these contents, or None."""
+    return drive_index.find_by_hash(content_hash, folder_id)
+
+def reconcile_folder_index(folder_id):
+    """Rebuild the local index entries for a folder from a full Drive listing."""
+    files = iter_files_in_folder(folder_id, fields='nextPageToken, files(id, name, md5Checksum, size, webViewLink)')
+    count = drive_index.reconcile_folder(folder_id, files)
+    print(f"Indexed {count} files in folder {folder_id}")
+    return count
+
+# Leading bytes of the image formats we accept, for sources without a useful name
+_MAGIC_NUMBERS = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+def detect_mimetype(file_name, head=b''):
+    """Guess a file's MIME type from its leading bytes, falling back to its name."""
+    for magic, mimetype in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mimetype
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:12] in (b'ftypheic', b'ftypheix', b'ftypmif1'):
+        return 'image/heic'
+    return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+class StreamUpload(MediaUpload):
+    """Resumable upload from a non-seekable stream that only buffers the unconfirmed chunk."""
+
+    def __init__(self, stream, mimetype, chunksize=UPLOAD_CHUNK_SIZE, head=b''):
+        super().__init__()
+        self._stream = stream
+        self._mimetype = mimetype
+        self._chunksize = chunksize
+        self._buffer = bytearray(head)
+        self._buffer_start = 0
+        self._eof = False
+        # Hash the contents as they stream past so the upload can be indexed
+        self.hasher = hashlib.md5(head)
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
         return False
 
-def upload_file(file_name, file_path, folder_id):
-    """Upload a file to a specific Google Drive folder."""
+    def getbytes(self, begin, length):
+        # Bytes before `begin` are confirmed by the server and can be dropped
+        del self._buffer[:begin - self._buffer_start]
+        self._buffer_start = begin
+        while len(self._buffer) < length and not self._eof:
+            data = self._stream.read(length - len(self._buffer))
+            if not data:
+                self._eof = True
+            else:
+                self.hasher.update(data)
+                self._buffer.extend(data)
+        return bytes(self._buffer[:length])
+
+def _content_hash(source):
+    """Hex MD5 (the hash Drive reports as md5Checksum) of a re-readable source, or None for streams."""
+    hasher = hashlib.md5()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        hasher.update(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+                hasher.update(block)
+    elif source.seekable():
+        position = source.tell()
+        for block in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b''):
+            hasher.update(block)
+        source.seek(position)
+    else:
+        return None
+    return hasher.hexdigest()
+
+def _media_for(file_name, source, mimetype=None, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Build a resumable media body for bytes, a file-like object or a path."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif isinstance(source, str):
+        if mimetype is None:
+            with open(source, 'rb') as f:
+                mimetype = detect_mimetype(file_name, f.read(16))
+        return MediaFileUpload(source, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+
+    if source.seekable():
+        if mimetype is None:
+            position = source.tell()
+            mimetype = detect_mimetype(file_name, source.read(16))
+            source.seek(position)
+        return MediaIoBaseUpload(source, mimetype=mimetype, chunksize=chunk_size, resumable=True)
+
+    head = source.read(16)
+    return StreamUpload(source, mimetype or detect_mimetype(file_name, head), chunk_size, head)
+
+def _run_resumable(request, progress=None):
+    """
+    Send a resumable upload chunk by chunk, resuming from the last confirmed
+    offset after transient failures.
+    """
+    response = None
+    failures = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk(num_retries=REQUEST_RETRIES)
+            failures = 0
+            if status is not None and progress is not None:
+                progress(status.resumable_progress, status.total_size)
+        except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+            if isinstance(error, HttpError) and error.resp.status not in RETRYABLE_STATUSES:
+                raise
+            failures += 1
+            if failures > REQUEST_RETRIES:
+                raise
+            print(f"Upload interrupted ({error}), resuming")
+            time.sleep(2 ** failures)
+    return response
+
+def upload_stream(file_name, source, folder_id, mimetype=None, chunk_size=UPLOAD_CHUNK_SIZE,
+                  progress=None, service=None, skip_duplicates=True):
+    """
+    Upload bytes, a file-like object or a file path through a Drive resumable session.
+
+    Args:
+        file_name (str): Name of the file in Drive.
+        source (bytes | file-like | str): Contents to upload.
+        folder_id (str): Destination folder.
+        mimetype (str): MIME type; detected from the contents when omitted.
+        chunk_size (int): Bytes sent per request, which also bounds the memory held for streams.
+        progress (callable): Called with (bytes_sent, total_bytes) after each chunk.
+        service: Drive client to use; defaults to one checked out of the pool.
+        skip_duplicates (bool): Return the existing file instead of uploading
+            when the folder already holds byte-identical contents.
+
+    Returns:
+        dict: The file's 'id' and 'webViewLink'; 'duplicate' is True when the upload was skipped.
+    """
+    content_hash = _content_hash(source)
+    if skip_duplicates and content_hash is not None:
+        existing = drive_index.find_by_hash(content_hash, folder_id)
+        if existing is not None:
+            print(f"Skipping upload of {file_name}: identical to {existing['file_id']}")
+            return {'id': existing['file_id'], 'webViewLink': existing['web_view_link'], 'duplicate': True}
+
     file_metadata = {
         'name': file_name,
         'parents': [folder_id]
     }
-    media = MediaFileUpload(file_path, mimetype='image/jpeg')
-    file = drive_service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields='id, webViewLink'
-    ).execute()
+    media = _media_for(file_name, source, mimetype, chunk_size)
+    with nullcontext(service) if service is not None else _pooled_service() as service:
+        request = service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, webViewLink'
+        )
+        file = _run_resumable(request, progress)
+    _listing_cache.invalidate(folder_id)
+
+    if content_hash is None and isinstance(media, StreamUpload):
+        content_hash = media.hasher.hexdigest()
+    drive_index.record_file(file['id'], file_name, folder_id, content_hash, web_view_link=file.get('webViewLink'))
     return file
 
+def upload_file(file_name, file_path, folder_id):
+    """Upload a file to a specific Google Drive folder."""
+    return upload_stream(file_name, file_path, folder_id)
+
+def upload_bytes(file_name, data, folder_id, mimetype=None):
+    """Upload in-memory file contents to a specific Google Drive folder."""
+    return upload_stream(file_name, data, folder_id, mimetype=mimetype)
+
+def upload_files(uploads, max_workers=UPLOAD_WORKERS):
+    """
+    Upload many files to Google Drive in parallel.
+
+    Args:
+        uploads (list): Dictionaries with 'file_name', 'file_path' and 'folder_id'.
+        max_workers (int): Maximum number of concurrent uploads.
+
+    Returns:
+        list: One result per upload, in input order. Successful results carry
+        'file_id' and 'webViewLink'; failed ones carry 'error'.
+    """
+    def upload(item):
+        result = {'file_name': item['file_name'], 'folder_id': item['folder_id']}
+        try:
+            file = upload_stream(item['file_name'], item['file_path'], item['folder_id'])
+            result.update({
+                'file_id': file.get('id'),
+                'webViewLink': file.get('webViewLink', 'No URL available')
+            })
+        except Exception as error:
+            print(f"Error uploading {item['file_name']}: {error}")
+            result['error'] = str(error)
+        return result
+
+    if not uploads:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(uploads)), thread_name_prefix='drive-upload') as executor:
+        return list(executor.map(upload, uploads))
+
+def _folder_query(folder_id):
+    # Escape the id so it is safe inside the quoted query string
+    escaped = folder_id.replace('\\', '\\\\').replace("'", "\\'")
+    return f"'{escaped}' in parents and trashed=false"
+
+def _list_page(folder_id, page_size=LIST_PAGE_SIZE, page_token=None, fields=LIST_FIELDS):
+    with _pooled_service() as service:
+        return service.files().list(
+            q=_folder_query(folder_id),
+            spaces='drive',
+            fields=fields,
+            pageSize=page_size,
+            pageToken=page_token
+        ).execute(num_retries=REQUEST_RETRIES)
+
+def iter_files_in_folder(folder_id, page_size=LIST_PAGE_SIZE, fields=LIST_FIELDS):
+    """
+    Yield every file in a Google Drive folder, following nextPageToken.
+
+    Args:
+        folder_id (str): Drive folder id.
+        page_size (int): Files requested per page.
+        fields (str): Field mask; must include nextPageToken.
+
+    Yields:
+        dict: File resources.
+    """
+    page_token = None
+    while True:
+        results = _list_page(folder_id, page_size, page_token, fields)
+        yield from results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+def list_files_page(folder_id, page_size=LIST_PAGE_SIZE, page_token=None):
+    """
+    Fetch one page of a folder listing, served from the cache when possible.
+
+    Returns:
+        tuple: (files, next_page_token). next_page_token is None on the last page.
+    """
+    pages = _listing_cache.get(folder_id) or {}
+    key = ('page', page_size, page_token)
+    if key not in pages:
+        results = _list_page(folder_id, page_size, page_token)
+        pages = dict(pages)
+        pages[key] = (results.get('files', []), results.get('nextPageToken'))
+        _listing_cache.set(folder_id, pages)
+    return pages[key]
+
 def list_files_in_folder(folder_id):
     """List all files in a Google Drive folder."""
     try:
-        results = drive_service.files().list(
-            q=f"'{folder_id}' in parents and trashed=false",
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
-        files = results.get('files', [])
+        pages = _listing_cache.get(folder_id) or {}
+        if 'all' not in pages:
+            pages = dict(pages)
+            pages['all'] = list(iter_files_in_folder(folder_id))
+            _listing_cache.set(folder_id, pages)
+        files = pages['all']
         if not files:
             print("No files found in the folder.")
-        else:
-            for file in files:
-                print(f"Found file: {file['name']} ({file['id']})")
         return files
     except Exception as error:
         print(f"Error listing files in folder: {error}")
         return []
 
+def invalidate_folder_listing(folder_id):
+    """Drop the cached listing for a folder after it is changed outside this module."""
+    _listing_cache.invalidate(folder_id)
+
+def _claim_metadata_fetches(file_ids):
+    """Split ids into futures this caller must resolve and futures already being fetched by others."""
+    owned, shared = {}, {}
+    with _metadata_lock:
+        for file_id in file_ids:
+            if file_id in _metadata_inflight:
+                shared[file_id] = _metadata_inflight[file_id]
+            else:
+                owned[file_id] = _metadata_inflight[file_id] = Future()
+    return owned, shared
+
+def _resolve_metadata_fetch(file_id, metadata):
+    if metadata is not None:
+        _metadata_cache.set(file_id, metadata)
+    with _metadata_lock:
+        future = _metadata_inflight.pop(file_id, None)
+    if future is not None:
+        future.set_result(metadata)
+
 def get_file_metadata(file_id):
     """Fetch metadata for a specific file in Google Drive."""
+    metadata = _metadata_cache.get(file_id)
+    if metadata is not None:
+        return metadata
+
+    owned, shared = _claim_metadata_fetches([file_id])
+    if file_id in shared:
+        return shared[file_id].result()
+
+    file_metadata = None
     try:
-        print(f"Fetching metadata for file ID: {file_id}")  # Debugging
-        file_metadata = drive_service.files().get(
-            fileId=file_id,
-            fields='id, name, webViewLink, mimeType, size'
-        ).execute()
-        print(f"Metadata for file {file_id}: {file_metadata}")  # Debugging
+        with _pooled_service() as service:
+            file_metadata = service.files().get(
+                fileId=file_id,
+                fields=METADATA_FIELDS
+            ).execute(num_retries=REQUEST_RETRIES)
         return file_metadata
     except HttpError as error:
         print(f"Error fetching metadata for file {file_id}: {error}")
         return None
+    finally:
+        _resolve_metadata_fetch(file_id, file_metadata)
+
+def get_files_metadata(file_ids):
+    """
+    Fetch metadata for many files, using the cache and Drive batch requests for misses.
+
+    Args:
+        file_ids (list): Drive file ids.
+
+    Returns:
+        dict: File id -> metadata, or None for files that could not be fetched.
+    """
+    results = {}
+    misses = []
+    for file_id in dict.fromkeys(file_ids):
+        metadata = _metadata_cache.get(file_id)
+        if metadata is not None:
+            results[file_id] = metadata
+        else:
+            misses.append(file_id)
+
+    owned, shared = _claim_metadata_fetches(misses)
+    fetched = {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            print(f"Error fetching metadata for file {request_id}: {exception}")
+        fetched[request_id] = response if exception is None else None
+
+    try:
+        owned_ids = list(owned)
+        for start in range(0, len(owned_ids), BATCH_REQUEST_LIMIT):
+            with _pooled_service() as service:
+                batch = service.new_batch_http_request(callback=callback)
+                for file_id in owned_ids[start:start + BATCH_REQUEST_LIMIT]:
+                    batch.add(service.files().get(fileId=file_id, fields=METADATA_FIELDS), request_id=file_id)
+                batch.execute()
+    except HttpError as error:
+        print(f"Error fetching metadata batch: {error}")
+    finally:
+        for file_id in owned:
+            _resolve_metadata_fetch(file_id, fetched.get(file_id))
+
+    results.update(fetched)
+    for file_id, future in shared.items():
+        results[file_id] = future.result()
+    return {file_id: results.get(file_id) for file_id in dict.fromkeys(file_ids)}
     
-def download_file(file_id, file_name):
+def download_file(file_id, file_name, progress=None):
     """Download a file from Google Drive."""
     try:
-        request = drive_service.files().get_media(fileId=file_id)
+        request = get_drive_service().files().get_media(fileId=file_id)
         file_path = os.path.join("downloads", file_name)
 
         os.makedirs("downloads", exist_ok=True)
@@ -83,10 +502,119 @@ def download_file(file_id, file_name):
             done = False
             while not done:
                 status, done = downloader.next_chunk()
-                print(f"Download progress: {int(status.progress() * 100)}%")
+                if progress is not None:
+                    progress(file_id, status.resumable_progress, status.total_size)
 
         print(f"File downloaded successfully: {file_path}")
         return file_path
     except HttpError as error:
         print(f"Error downloading file: {error}")
-        raise error
\ No newline at end of file
+        raise error
+
+def iter_download(file_id, chunk_size=DOWNLOAD_CHUNK_SIZE, progress=None):
+    """
+    Stream a file from Google Drive chunk by chunk without touching the disk.
+
+    Args:
+        file_id (str): Drive file id.
+        chunk_size (int): Bytes fetched per request.
+        progress (callable): Called with (file_id, bytes_done, total_bytes) after each chunk.
+
+    Yields:
+        bytes: Consecutive chunks of the file.
+    """
+    buffer = io.BytesIO()
+    with _pooled_service() as service:
+        request = service.files().get_media(fileId=file_id)
+        downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+        done = False
+        while not done:
+            status, done = downloader.next_chunk(num_retries=REQUEST_RETRIES)
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if progress is not None:
+                progress(file_id, status.resumable_progress, status.total_size)
+            if chunk:
+                yield chunk
+
+class _RangeNotHonored(Exception):
+    """Raised when the server answers a Range request with anything but the requested part."""
+    pass
+
+def _download_ranges(file_id, size, progress=None, part_size=DOWNLOAD_CHUNK_SIZE, max_workers=RANGE_WORKERS):
+    """Fetch a file as concurrent HTTP Range requests into one preallocated buffer."""
+    data = bytearray(size)
+    view = memoryview(data)
+    done = [0]
+    lock = threading.Lock()
+
+    def fetch(start):
+        end = min(start + part_size, size) - 1
+        with _pooled_service() as service:
+            request = service.files().get_media(fileId=file_id)
+            request.headers['Range'] = f'bytes={start}-{end}'
+            # Keep the response so the status can be checked; a server may ignore Range and send everything
+            request.postproc = lambda response, content: (response, content)
+            response, content = request.execute(num_retries=REQUEST_RETRIES)
+        if response.status != 206 or len(content) != end - start + 1:
+            raise _RangeNotHonored(f"Expected bytes {start}-{end}, got status {response.status} with {len(content)} bytes")
+        view[start:end + 1] = content
+        if progress is not None:
+            with lock:
+                done[0] += len(content)
+                progress(file_id, done[0], size)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='drive-range') as executor:
+        list(executor.map(fetch, range(0, size, part_size)))
+    return bytes(data)
+
+def download_bytes(file_id, progress=None, size=None):
+    """
+    Download a file from Google Drive into memory.
+
+    Files above RANGE_DOWNLOAD_THRESHOLD are fetched as parallel Range requests.
+
+    Args:
+        file_id (str): Drive file id.
+        progress (callable): Called with (file_id, bytes_done, total_bytes).
+        size (int): File size if already known; taken from the (cached) file metadata otherwise.
+
+    Returns:
+        bytes: The file contents.
+    """
+    if size is None:
+        metadata = get_file_metadata(file_id) or {}
+        size = int(metadata.get('size', 0))
+
+    if size > RANGE_DOWNLOAD_THRESHOLD:
+        try:
+            return _download_ranges(file_id, size, progress)
+        except _RangeNotHonored as error:
+            print(f"Range download of {file_id} failed ({error}), downloading in one stream")
+    return b''.join(iter_download(file_id, progress=progress))
+
+def download_files(file_ids, progress=None, max_workers=DOWNLOAD_WORKERS):
+    """
+    Download many files from Google Drive into memory in parallel.
+
+    Args:
+        file_ids (list): Drive file ids.
+        progress (callable): Called with (file_id, bytes_done, total_bytes).
+        max_workers (int): Maximum number of concurrent downloads.
+
+    Returns:
+        list: One dictionary per file id, in input order, with 'file_id' and
+        either 'data' or 'error'.
+    """
+    def download(file_id):
+        try:
+            return {'file_id': file_id, 'data': download_bytes(file_id, progress)}
+        except Exception as error:
+            print(f"Error downloading file {file_id}: {error}")
+            return {'file_id': file_id, 'error': str(error)}
+
+    if not file_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(file_ids)), thread_name_prefix='drive-download') as executor:
+        return list(executor.map(download, file_ids))
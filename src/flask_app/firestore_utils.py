@@ -1,19 +1,60 @@
+import threading
+import time
 import firebase_admin
 from firebase_admin import credentials, firestore
 from datetime import datetime
+from google.api_core.exceptions import NotFound
+from .cache_utils import TTLCache
+from .write_buffer import FirestoreWriteBuffer
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("credentials/service-account.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Parsed-status cache; a parsed image never becomes unparsed, so those entries live longer
+PARSED_CACHE_TTL = 5  # seconds
+PARSED_TRUE_TTL = 60 * 60
+PARSED_CACHE_ITEMS = 10000
+LONG_POLL_RECHECK = 5  # seconds between Firestore reads while long-polling
 
-def save_metadata_to_firestore(file_metadata, clothing_data=None):
+SERVICE_ACCOUNT_FILE = "credentials/service-account.json"
+
+# Firebase app, Firestore client and write buffer, created on first use
+_db = None
+_write_buffer = None
+_init_lock = threading.Lock()
+
+def get_db():
+    """Return the Firestore client, initializing the Firebase Admin SDK on first use."""
+    global _db
+    if _db is None:
+        with _init_lock:
+            if _db is None:
+                cred = credentials.Certificate(SERVICE_ACCOUNT_FILE)
+                firebase_admin.initialize_app(cred)
+                _db = firestore.client()
+    return _db
+
+def get_write_buffer():
+    """Return the shared write buffer; image and clothing writes are committed together in batches."""
+    global _write_buffer
+    if _write_buffer is None:
+        db = get_db()
+        with _init_lock:
+            if _write_buffer is None:
+                _write_buffer = FirestoreWriteBuffer(db)
+    return _write_buffer
+
+_parsed_cache = TTLCache(max_items=PARSED_CACHE_ITEMS, ttl=PARSED_CACHE_TTL)
+_parsed_changed = threading.Condition()
+
+def save_metadata_to_firestore(file_metadata, clothing_data=None, wait=False):
     """
     Save file metadata to Firestore, with optional clothing data.
 
     Args:
         file_metadata (dict): Metadata of the file uploaded to Google Drive.
         clothing_data (list): List of dictionaries containing clothing data (optional).
+        wait (bool): Block until the write is committed instead of leaving it in the write buffer.
+
+    Returns:
+        str: ID of the new image document.
     """
     try:
         # Validate that required fields exist in file_metadata
@@ -21,7 +62,7 @@ def save_metadata_to_firestore(file_metadata, clothing_data=None):
             raise ValueError("Missing required fields 'id' or 'name' in file_metadata.")
 
         print(f"Saving metadata to Firestore: {file_metadata}")
-        doc_ref = db.collection("Images").document()
+        doc_ref = get_db().collection("Images").document()
 
         # Construct Google Drive public URL
         file_id = file_metadata["id"]
@@ -44,9 +85,12 @@ def save_metadata_to_firestore(file_metadata, clothing_data=None):
         if clothing_data:
             metadata.update({"clothingData": clothing_data})
 
-        # Save to Firestore
-        doc_ref.set(metadata)
-        print(f"Metadata saved successfully for file: {file_metadata['name']}")
+        # Queue the write; it is committed with the next batch
+        future = get_write_buffer().set(doc_ref, metadata)
+        if wait:
+            future.result()
+        print(f"Metadata queued for file: {file_metadata['name']}")
+        return doc_ref.id
     except ValueError as ve:
         print(f"Validation error: {ve}")
         raise ve
@@ -54,32 +98,52 @@ def save_metadata_to_firestore(file_metadata, clothing_data=None):
         print(f"Error saving metadata to Firestore: {e}")
         raise e
 
-def save_clothing_items(image_id, clothing_items):
+def save_clothing_items(image_id, clothing_items, wait=False):
     """
     Save clothing items to Firestore under the associated image.
 
     Args:
         image_id (str): ID of the image document.
         clothing_items (list): List of clothing item metadata dictionaries.
+        wait (bool): Block until the write is committed instead of leaving it in the write buffer.
+
+    Returns:
+        Future: Resolves once the write is committed; fails with NotFound if
+        the image document does not exist.
     """
+    future = None
     try:
-        image_ref = db.collection("Images").document(image_id)
-        doc = image_ref.get()
+        image_ref = get_db().collection("Images").document(image_id)
 
-        if not doc.exists:
-            print("No such image document!")
-            return
-
-        # Update Firestore with clothing items
-        image_ref.update({"clothingItems": clothing_items})
-        print(f"Clothing items saved for image ID: {image_id}")
+        # The update only applies if the document exists, so no read is needed first
+        future = get_write_buffer().update(image_ref, {"clothingItems": clothing_items})
+        if wait:
+            future.result()
+        print(f"Clothing items queued for image ID: {image_id}")
+        return future
+    except NotFound:
+        print("No such image document!")
+        return future
     except Exception as e:
         print(f"Error saving clothing items: {e}")
         raise e
 
+@firestore.transactional
+def _toggle_like(transaction, image_ref):
+    snapshot = image_ref.get(field_paths=["isLiked"], transaction=transaction)
+    if not snapshot.exists:
+        return None
+
+    is_liked = not (snapshot.to_dict() or {}).get("isLiked", False)
+    transaction.update(image_ref, {"isLiked": is_liked})
+    return is_liked
+
 def like_image(image_id):
     """
-    Toggle the like status of an image.
+    Toggle the like status of an image atomically.
+
+    This costs a transaction (begin, read, commit); set_image_like is the
+    single-write path for callers that know the state they want.
 
     Args:
         image_id (str): ID of the image document.
@@ -88,20 +152,76 @@ def like_image(image_id):
         str: Message indicating whether the image was liked or unliked.
     """
     try:
-        image_ref = db.collection("Images").document(image_id)
-        doc = image_ref.get()
+        image_ref = get_db().collection("Images").document(image_id)
+        is_liked = _toggle_like(get_db().transaction(), image_ref)
 
-        if not doc.exists:
+        if is_liked is None:
             return "No such document!"
+        return "Image liked" if is_liked else "Image unliked"
+    except Exception as e:
+        print(f"Error liking image: {e}")
+        raise e
+
+def set_image_like(image_id, is_liked):
+    """
+    Set the like status of an image in a single write, without reading it first.
 
-        data = doc.to_dict()
-        is_liked = not data.get("isLiked", False)
-        image_ref.update({"isLiked": is_liked})
+    Args:
+        image_id (str): ID of the image document.
+        is_liked (bool): New like status.
+
+    Returns:
+        str: Message indicating whether the image was liked or unliked.
+    """
+    if not isinstance(is_liked, bool):
+        raise ValueError("isLiked must be a boolean")
+
+    try:
+        get_db().collection("Images").document(image_id).update({"isLiked": is_liked})
         return "Image liked" if is_liked else "Image unliked"
+    except NotFound:
+        return "No such document!"
     except Exception as e:
         print(f"Error liking image: {e}")
         raise e
 
+def set_image_likes(likes):
+    """
+    Apply many like/unlike operations in one batched commit.
+
+    Args:
+        likes (list): Dictionaries with 'image_id' and 'isLiked'.
+
+    Returns:
+        list: One dictionary per operation with 'image_id', 'isLiked' and
+        'success', plus 'error' for operations that failed.
+    """
+    if any(not isinstance(like["isLiked"], bool) for like in likes):
+        raise ValueError("isLiked must be a boolean")
+
+    buffer = get_write_buffer()
+    futures = [
+        (like["image_id"], like["isLiked"],
+         buffer.update(get_db().collection("Images").document(like["image_id"]), {"isLiked": like["isLiked"]}))
+        for like in likes
+    ]
+    buffer.flush()
+
+    results = []
+    for image_id, is_liked, future in futures:
+        result = {"image_id": image_id, "isLiked": is_liked, "success": True}
+        try:
+            future.result()
+        except NotFound:
+            result.update({"success": False, "error": "No such document!"})
+        except Exception as e:
+            result.update({"success": False, "error": str(e)})
+        results.append(result)
+    return results
+
+def _cache_parsed(image_id, parsed):
+    _parsed_cache.set(image_id, parsed, ttl=PARSED_TRUE_TTL if parsed else None)
+
 def check_if_image_parsed(image_id):
     """
     Check if the image has been parsed.
@@ -112,16 +232,94 @@ def check_if_image_parsed(image_id):
     Returns:
         bool: True if the image has been parsed, False otherwise.
     """
-    try:
-        image_ref = db.collection("Images").document(image_id)
-        doc = image_ref.get()
+    parsed = _parsed_cache.get(image_id)
+    if parsed is not None:
+        return parsed
 
-        if not doc.exists:
-            return False
+    try:
+        image_ref = get_db().collection("Images").document(image_id)
+        doc = image_ref.get(field_paths=["beenParsed"])
 
-        data = doc.to_dict()
-        return data.get("beenParsed", False)
+        parsed = bool((doc.to_dict() or {}).get("beenParsed", False)) if doc.exists else False
+        _cache_parsed(image_id, parsed)
+        return parsed
     except Exception as e:
         print(f"Error checking if image is parsed: {e}")
         raise e
-    
\ No newline at end of file
+
+def check_images_parsed(image_ids):
+    """
+    Check the parsed status of many images with a single Firestore read for the cache misses.
+
+    Args:
+        image_ids (list): IDs of image documents.
+
+    Returns:
+        dict: Image ID -> True if the image has been parsed, False otherwise.
+    """
+    results = {}
+    misses = []
+    for image_id in dict.fromkeys(image_ids):
+        parsed = _parsed_cache.get(image_id)
+        if parsed is None:
+            misses.append(image_id)
+        else:
+            results[image_id] = parsed
+
+    if misses:
+        try:
+            refs = [get_db().collection("Images").document(image_id) for image_id in misses]
+            for doc in get_db().get_all(refs, field_paths=["beenParsed"]):
+                parsed = bool((doc.to_dict() or {}).get("beenParsed", False)) if doc.exists else False
+                results[doc.id] = parsed
+                _cache_parsed(doc.id, parsed)
+        except Exception as e:
+            print(f"Error checking if images are parsed: {e}")
+            raise e
+
+    return {image_id: results.get(image_id, False) for image_id in image_ids}
+
+def mark_image_parsed(image_id, parsed=True):
+    """
+    Record that the processing pipeline has parsed an image, updating the status cache once the write commits.
+
+    Args:
+        image_id (str): ID of the image document.
+        parsed (bool): New parsed status.
+
+    Returns:
+        Future: Resolves once the write is committed.
+    """
+    def on_commit(future):
+        # Only a committed write may be cached; otherwise /check would report it for PARSED_TRUE_TTL
+        if future.exception() is not None:
+            print(f"Error marking image {image_id} parsed: {future.exception()}")
+            _parsed_cache.invalidate(image_id)
+            return
+        _cache_parsed(image_id, parsed)
+        with _parsed_changed:
+            _parsed_changed.notify_all()
+
+    future = get_write_buffer().update(get_db().collection("Images").document(image_id), {"beenParsed": parsed})
+    future.add_done_callback(on_commit)
+    return future
+
+def wait_for_image_parsed(image_id, timeout):
+    """
+    Long-poll until an image is parsed or the timeout passes.
+
+    Wakes immediately when this process marks the image parsed, and re-reads
+    Firestore every LONG_POLL_RECHECK seconds for images parsed elsewhere.
+
+    Returns:
+        bool: The parsed status when the call returns.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        if check_if_image_parsed(image_id):
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        with _parsed_changed:
+            _parsed_changed.wait(min(remaining, LONG_POLL_RECHECK))
@@ -0,0 +1,154 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Job store settings
+JOB_WORKERS = 2
+MAX_FINISHED_JOBS = 200
+FINISHED_JOB_TTL = 60 * 60  # seconds
+
+class Job:
+    """A background batch job with per-file progress."""
+
+    def __init__(self, kind, file_names, file_ids=None):
+        """
+        Args:
+            kind (str): Name of the job type.
+            file_names (list): Names of the files the job will process.
+            file_ids (list): Unique ids of those files, e.g. Drive ids. Progress is
+                then tracked by id, so files sharing a name are kept apart.
+        """
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.stats = None
+        self.keyed_by_id = file_ids is not None
+        if self.keyed_by_id:
+            self.files = OrderedDict((file_id, {"file_name": name, "status": "pending"})
+                                     for file_id, name in zip(file_ids, file_names))
+        else:
+            self.files = OrderedDict((name, {"status": "pending"}) for name in file_names)
+        self.total = len(self.files)
+        self._lock = threading.Lock()
+
+    def _count(self, status, delta):
+        if status == "done":
+            self.completed += delta
+        elif status == "failed":
+            self.failed += delta
+        elif status == "skipped":
+            self.skipped += delta
+
+    def update_file(self, key, status, result=None, error=None):
+        """Record the outcome of one file (by id if the job has ids, else by name) and keep the counters in step."""
+        with self._lock:
+            previous = self.files.get(key, {})
+            # A file reported twice replaces its earlier outcome rather than being counted again
+            self._count(previous.get("status"), -1)
+            self._count(status, 1)
+            entry = {"status": status}
+            if "file_name" in previous:
+                entry = {"file_name": previous["file_name"], **entry}
+            if result is not None:
+                entry["result"] = result
+            if error is not None:
+                entry["error"] = error
+            if key not in self.files:
+                self.total += 1
+            self.files[key] = entry
+
+    def to_dict(self, include_files=False):
+        """Summary of the job; per-file entries are only included on request."""
+        with self._lock:
+            data = {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "error": self.error,
+            }
+            if self.stats is not None:
+                data["stats"] = self.stats
+            if include_files:
+                if self.keyed_by_id:
+                    data["files"] = [{"file_id": file_id, **entry} for file_id, entry in self.files.items()]
+                else:
+                    data["files"] = [{"file_name": name, **entry} for name, entry in self.files.items()]
+            return data
+
+class JobStore:
+    """In-process job store that runs jobs on a thread pool and keeps a bounded history."""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_finished=MAX_FINISHED_JOBS, ttl=FINISHED_JOB_TTL):
+        self.max_finished = max_finished
+        self.ttl = ttl
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, kind, file_names, handler, file_ids=None):
+        """
+        Start a job that runs handler(job) in the background.
+
+        Args:
+            kind (str): Name of the job type, reported back to clients.
+            file_names (list): Files the job will process.
+            handler (callable): Does the work and reports progress through the job.
+            file_ids (list): Unique ids of the files, to track progress by id.
+
+        Returns:
+            Job: The queued job.
+        """
+        job = Job(kind, file_names, file_ids)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, handler)
+        return job
+
+    def _run(self, job, handler):
+        job.status = "running"
+        try:
+            handler(job)
+            job.status = "failed" if job.failed and not job.completed else "done"
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._finished[job.id] = job.finished_at
+                self._prune()
+
+    def _prune(self):
+        # Forget the oldest finished jobs once they expire or the history is full
+        now = time.time()
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and now - finished_at <= self.ttl:
+                break
+            self._finished.popitem(last=False)
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id):
+        """Return the job with this id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+# Shared job store for the API
+job_store = JobStore()
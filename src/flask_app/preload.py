@@ -0,0 +1,21 @@
+def preload(clients=True, models=False):
+    """
+    Create the lazily initialized clients and models up front, e.g. before a
+    production server starts taking traffic.
+
+    Args:
+        clients (bool): Build the Drive client and initialize Firebase.
+        models (bool): Import the ML pipeline and load the detection models.
+    """
+    if clients:
+        from .drive_utils import get_drive_service
+        from .firestore_utils import get_db, get_write_buffer
+
+        get_drive_service()
+        get_db()
+        get_write_buffer()
+
+    if models:
+        from src.ml_module.registry import warm_up
+
+        warm_up()
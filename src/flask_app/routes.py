@@ -1,75 +1,199 @@
 from flask import Blueprint, request, jsonify
-from .firestore_utils import like_image, check_if_image_parsed, save_metadata_to_firestore
-from .drive_utils import upload_file, get_file_metadata, list_files_in_folder, download_file
+from .firestore_utils import (
+    like_image, set_image_like, set_image_likes, check_if_image_parsed, check_images_parsed,
+    wait_for_image_parsed, save_metadata_to_firestore
+)
+from .drive_utils import (
+    upload_files, upload_stream, detect_mimetype, get_file_metadata, get_files_metadata,
+    list_files_in_folder, list_files_page, download_file
+)
+from .jobs import job_store
+from .streaming import ChunkReader, UploadTooLarge, iter_body, open_multipart_file
 from googleapiclient.errors import HttpError
-from src.ml_module.main import DRIVE_FOLDERS, service_model  # Import the AI function
+from werkzeug.exceptions import HTTPException
+from src.ml_module.cache import detection_cache
 import os
 
 routes = Blueprint("routes", __name__)
 
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+
 @routes.route("/", methods=["GET"])
 def home():
     return jsonify({
-        "message": "Welcome to the Flask API. Use `/upload` to upload images, `/like` to like/unlike an image, and `/drive` to fetch files."
+        "message": "Welcome to the Flask API. Use `/upload` to upload images, `/like` to like/unlike an image (send `isLiked`), and `/drive` to fetch files."
     })
 
+def _queue_detection(file_name, file_id, image_bytes):
+    """Run the detection pipeline on an uploaded image in a background job."""
+    def handler(job):
+        from src.ml_module.worker_pool import INFERENCE_JOB_TIMEOUT, get_pool
+
+        try:
+            detections = get_pool().submit(image_bytes).result(timeout=INFERENCE_JOB_TIMEOUT)
+            finals = [person["final"] for person in detections["people"]]
+            job.update_file(file_name, "done", result={"file_id": file_id, "detections": finals})
+        except Exception as error:
+            job.update_file(file_name, "failed", error=str(error))
+
+    return job_store.submit("detect", [file_name], handler)
+
 @routes.route("/upload", methods=["POST"])
 def upload_image():
-    data = request.get_json()
-    file_name = data.get("file_name")
-    file_path = data.get("file_path")
-    folder_id = data.get("folder_id")
+    """
+    Streams an image to Google Drive without writing it to disk.
 
-    if not file_name or not file_path or not folder_id:
-        return jsonify({"error": "file_name, file_path, and folder_id are required"}), 400
+    Accepts a multipart form with a file part, or a raw image body. `file_name`
+    and `folder_id` come from form fields sent before the file or from the
+    query string. Pass `detect=1` to also run the detection pipeline in a
+    background job; the image is then kept in memory until the job runs.
+    Server-side file paths are not accepted.
+    """
+    if request.is_json:
+        return jsonify({"error": "Send the image as multipart/form-data or a raw body, not a file_path"}), 400
 
-    try:
-        uploaded_file = upload_file(file_name, file_path, folder_id)
-        if not uploaded_file:
-            return jsonify({"error": "Failed to upload file to Google Drive"}), 500
+    if request.content_length is not None and request.content_length > UPLOAD_MAX_BYTES:
+        return jsonify({"error": f"Upload exceeds the {UPLOAD_MAX_BYTES} byte limit"}), 413
 
-        return jsonify({
+    detect = request.args.get("detect", "0").lower() in ("1", "true")
+    try:
+        if request.mimetype == "multipart/form-data":
+            boundary = request.mimetype_params.get("boundary")
+            if not boundary:
+                return jsonify({"error": "Multipart boundary is missing"}), 400
+            fields, filename, _, reader = open_multipart_file(
+                request.stream, boundary.encode("latin-1"), max_size=UPLOAD_MAX_BYTES, keep_copy=detect
+            )
+        else:
+            fields, filename = {}, None
+            reader = ChunkReader(iter_body(request.stream), UPLOAD_MAX_BYTES, keep_copy=detect)
+
+        file_name = fields.get("file_name") or request.args.get("file_name") or filename
+        folder_id = fields.get("folder_id") or request.args.get("folder_id")
+        if not file_name or not folder_id:
+            return jsonify({"error": "file_name and folder_id are required"}), 400
+
+        # Reject anything that does not start like an image before talking to Drive
+        mimetype = detect_mimetype("", reader.peek(16))
+        if not mimetype.startswith("image/"):
+            return jsonify({"error": "Uploaded file is not a supported image"}), 415
+
+        uploaded_file = upload_stream(file_name, reader, folder_id, mimetype=mimetype)
+        response = {
             "message": "File uploaded successfully",
             "file_id": uploaded_file.get("id"),
-            "public_url": uploaded_file.get("webViewLink", "No URL available")
-        }), 200
+            "public_url": uploaded_file.get("webViewLink", "No URL available"),
+            "sha256": reader.sha256.hexdigest(),
+            "size": reader.size
+        }
+        if detect:
+            job = _queue_detection(file_name, uploaded_file.get("id"), bytes(reader.copy))
+            response.update({"job_id": job.id, "status_url": f"/jobs/{job.id}"})
+        return jsonify(response), 200
+    except UploadTooLarge as error:
+        return jsonify({"error": str(error)}), 413
+    except HTTPException as error:
+        # e.g. RequestEntityTooLarge raised by werkzeug while the body is read
+        return jsonify({"error": error.description}), error.code
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
     except Exception as error:
         return jsonify({"error": str(error)}), 500
 
 @routes.route("/like/<image_id>", methods=["POST"])
 def like_unlike_image(image_id):
     """
-    Toggles the like/unlike state of an image in Firestore.
+    Sets the like state of an image from `{"isLiked": true|false}` in the
+    body, in a single write. Clients should always send `isLiked`: without it
+    the state is toggled in a transaction (a read plus a commit, three round
+    trips), which is kept only for older clients.
     """
+    data = request.get_json(silent=True) or {}
+    if "isLiked" in data and not isinstance(data["isLiked"], bool):
+        return jsonify({"error": "isLiked must be true or false"}), 400
+
     try:
-        message = like_image(image_id)
+        if "isLiked" in data:
+            message = set_image_like(image_id, data["isLiked"])
+        else:
+            message = like_image(image_id)
         return jsonify({"message": message}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@routes.route("/like", methods=["POST"])
+def bulk_like_images():
+    """
+    Applies many like/unlike operations in one batched commit.
+    """
+    data = request.get_json(silent=True) or {}
+    likes = data.get("likes")
+    if not isinstance(likes, list) or not likes:
+        return jsonify({"error": "likes must be a non-empty list"}), 400
+    if any(not isinstance(like, dict) or "image_id" not in like or "isLiked" not in like for like in likes):
+        return jsonify({"error": "each like needs image_id and isLiked"}), 400
+    if any(not isinstance(like["isLiked"], bool) for like in likes):
+        return jsonify({"error": "isLiked must be true or false"}), 400
+
+    try:
+        return jsonify({"results": set_image_likes(likes)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @routes.route("/check/<image_id>", methods=["GET"])
 def check_parsed(image_id):
     """
-    Checks if an image has been parsed.
+    Checks if an image has been parsed. Pass `wait=<seconds>` (up to 60) to
+    hold the request open until the image is parsed or the time runs out.
     """
+    wait = request.args.get("wait", 0, type=float)
     try:
-        parsed = check_if_image_parsed(image_id)
+        if wait > 0:
+            parsed = wait_for_image_parsed(image_id, min(wait, 60))
+        else:
+            parsed = check_if_image_parsed(image_id)
         return jsonify({"image_id": image_id, "been_parsed": parsed}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@routes.route("/check", methods=["POST"])
+def check_parsed_bulk():
+    """
+    Checks whether many images have been parsed in one request.
+    """
+    data = request.get_json(silent=True) or {}
+    image_ids = data.get("image_ids")
+    if not isinstance(image_ids, list) or not image_ids:
+        return jsonify({"error": "image_ids must be a non-empty list"}), 400
+
+    try:
+        parsed = check_images_parsed(image_ids)
+        return jsonify({"results": [{"image_id": image_id, "been_parsed": parsed[image_id]} for image_id in parsed]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @routes.route("/drive", methods=["GET"])
 def list_drive_files():
     """
-    Lists files from a specific Google Drive folder.
+    Lists files from a specific Google Drive folder. Pass `page_size` and/or
+    `page_token` to fetch one page at a time.
     """
     folder_id = request.args.get("folder_id")  # Example: Pass folder_id as a query parameter
     if not folder_id:
         return jsonify({"error": "folder_id is required"}), 400
 
+    page_size = request.args.get("page_size", type=int)
+    page_token = request.args.get("page_token")
+    if page_size is not None and not 1 <= page_size <= 1000:
+        return jsonify({"error": "page_size must be between 1 and 1000"}), 400
+
     try:
-        files = list_files_in_folder(folder_id)
-        return jsonify({"files": files}), 200
+        if page_size is None and page_token is None:
+            files = list_files_in_folder(folder_id)
+            return jsonify({"files": files}), 200
+
+        files, next_page_token = list_files_page(folder_id, page_size or 100, page_token)
+        return jsonify({"files": files, "next_page_token": next_page_token}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -84,13 +208,55 @@ def fetch_file_metadata(file_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+@routes.route("/drive/metadata", methods=["POST"])
+def fetch_files_metadata():
+    """
+    Fetches metadata for many Google Drive files in one request.
+    """
+    data = request.get_json(silent=True) or {}
+    file_ids = data.get("file_ids")
+    if not isinstance(file_ids, list) or not file_ids:
+        return jsonify({"error": "file_ids must be a non-empty list"}), 400
+
+    try:
+        return jsonify({"files_metadata": get_files_metadata(file_ids)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@routes.route("/ai/cache", methods=["GET"])
+def detection_cache_stats():
+    """
+    Reports hit/miss counters for the detection result cache.
+    """
+    return jsonify(detection_cache.stats()), 200
+
+def _downloaded_files(downloads_dir):
+    return [f for f in os.listdir(downloads_dir) if os.path.isfile(os.path.join(downloads_dir, f))]
+
+def _upload_downloaded_files(job, downloads_dir, targets):
+    """Upload (file_name, folder_id) pairs from the downloads folder in parallel, record them on the job and delete them locally."""
+    uploads = [
+        {"file_name": file_name, "file_path": os.path.join(downloads_dir, file_name), "folder_id": folder_id}
+        for file_name, folder_id in targets
+    ]
+    for upload, result in zip(uploads, upload_files(uploads)):
+        if "error" in result:
+            job.update_file(result["file_name"], "failed", error=result["error"])
+            continue
+
+        print(f"Uploaded file: {result}")
+        job.update_file(result["file_name"], "done", result=result)
+
+        # Delete the file locally after upload
+        if os.path.exists(upload["file_path"]):
+            os.remove(upload["file_path"])
+
 @routes.route("/ai/process", methods=["POST"])
 def process_file_with_ai():
     """
-    Process files in the downloads folder based on their last character
-    and upload them to their respective folders in Google Drive.
+    Queue a job that uploads the files in the downloads folder to their
+    Google Drive folders based on the last character of their names.
     """
-    data = request.get_json()
     folder_mapping = {
         "0": "1OavV3D6tBao6KG13QjPQH4r3PI5TSv3A",  # Head
         "1": "16BKpECjxVN_N7HTtQJoaqQkCKnjmH1zz",  # Top
@@ -101,49 +267,31 @@ def process_file_with_ai():
     downloads_dir = "downloads"
 
     try:
-        uploaded_files = []
-
-        # Iterate over files in the downloads folder
-        for file_name in os.listdir(downloads_dir):
-            file_path = os.path.join(downloads_dir, file_name)
-
-            # Ensure it's a valid file
-            if not os.path.isfile(file_path):
-                continue
-
-            # Extract the last character before the file extension
-            last_char = os.path.splitext(file_name)[0][-1]
-
-            # Determine the folder ID based on the last character
-            folder_id = folder_mapping.get(last_char)
-            if not folder_id:
-                print(f"Invalid classification for file {file_name}. Skipping.")
-                continue
-
-            # Upload the file to the correct Google Drive folder
-            uploaded_file = upload_file(
-                file_name=file_name,
-                file_path=file_path,
-                folder_id=folder_id
-            )
-            print(f"Uploaded file: {uploaded_file}")
+        files = _downloaded_files(downloads_dir)
+
+        def handler(job):
+            targets = []
+            for file_name in files:
+                # Extract the last character before the file extension
+                last_char = os.path.splitext(file_name)[0][-1]
+
+                # Determine the folder ID based on the last character
+                folder_id = folder_mapping.get(last_char)
+                if not folder_id:
+                    print(f"Invalid classification for file {file_name}. Skipping.")
+                    job.update_file(file_name, "skipped", error="Invalid classification")
+                    continue
 
-            # Add to the list of uploaded files
-            uploaded_files.append({
-                "file_name": file_name,
-                "folder_id": folder_id,
-                "file_id": uploaded_file.get("id"),
-                "webViewLink": uploaded_file.get("webViewLink", "No URL available")
-            })
+                targets.append((file_name, folder_id))
 
-            # Delete the file locally after upload
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            _upload_downloaded_files(job, downloads_dir, targets)
 
+        job = job_store.submit("process", files, handler)
         return jsonify({
-            "message": "Files processed and uploaded successfully",
-            "uploaded_files": uploaded_files
-        }), 200
+            "message": "Processing job queued",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}"
+        }), 202
 
     except Exception as error:
         print(f"Error processing files: {error}")
@@ -153,8 +301,8 @@ def process_file_with_ai():
 @routes.route("/ai/process_and_upload", methods=["POST"])
 def process_file_with_ai_and_upload():
     """
-    Process files in the 'downloads' directory and upload each file to 
-    a specified Google Drive folder based on its key in the data.
+    Queue a job that uploads each file in the 'downloads' directory to the
+    Google Drive folder given for it in the request data.
     """
     try:
         data = request.get_json()
@@ -169,36 +317,87 @@ def process_file_with_ai_and_upload():
         if not os.path.exists(downloads_path):
             return jsonify({"error": f"Directory '{downloads_path}' not found"}), 400
 
-        files = [f for f in os.listdir(downloads_path) if os.path.isfile(os.path.join(downloads_path, f))]
+        files = _downloaded_files(downloads_path)
 
         if not files:
             return jsonify({"error": "No files found in the 'downloads' directory"}), 400
 
-        uploaded_files = []
-        for file_name in files:
-            full_path = os.path.join(downloads_path, file_name)
-            folder_id = folder_mappings.get(file_name)
+        def handler(job):
+            targets = []
+            for file_name in files:
+                folder_id = folder_mappings.get(file_name)
 
-            if not folder_id:
-                print(f"Skipping {file_name}: No folder ID provided in 'folder_mappings'")
-                continue
+                if not folder_id:
+                    print(f"Skipping {file_name}: No folder ID provided in 'folder_mappings'")
+                    job.update_file(file_name, "skipped", error="No folder ID provided")
+                    continue
 
-            # Upload the file to the specified folder
-            uploaded_file = upload_file(file_name, full_path, folder_id)
-            uploaded_files.append({
-                "file_name": file_name,
-                "folder_id": folder_id,
-                "file_id": uploaded_file.get("id"),
-                "webViewLink": uploaded_file.get("webViewLink", "No URL available")
-            })
+                targets.append((file_name, folder_id))
 
-            # Delete the local file after upload
-            os.remove(full_path)
+            _upload_downloaded_files(job, downloads_path, targets)
 
+        job = job_store.submit("process_and_upload", files, handler)
         return jsonify({
-            "message": "Files processed, uploaded, and cleaned up successfully",
-            "uploaded_files": uploaded_files
-        }), 200
+            "message": "Processing job queued",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}"
+        }), 202
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@routes.route("/ai/ingest", methods=["POST"])
+def ingest_drive_photos():
+    """
+    Queue a job that downloads, detects, crops, uploads and records Drive
+    photos as overlapped pipeline stages. Takes either `files` (a list of
+    {file_id, name, image_id?}) or a `folder_id` to ingest.
+    """
+    data = request.get_json(silent=True) or {}
+    files = data.get("files")
+    folder_id = data.get("folder_id")
+
+    try:
+        if files is None and folder_id:
+            files = [{"file_id": f["id"], "name": f["name"]} for f in list_files_in_folder(folder_id)]
+        if not isinstance(files, list) or not files or any(
+            not isinstance(f, dict) or "file_id" not in f or "name" not in f for f in files
+        ):
+            return jsonify({"error": "files (objects with file_id and name) or folder_id is required"}), 400
+
+        def handler(job):
+            from src.ml_module.ingest import run_ingest
+
+            results, stats = run_ingest(files)
+            # Drive allows duplicate names, so progress is tracked by file id
+            for item in results:
+                if item.get("error"):
+                    job.update_file(item["file_id"], "failed", error=item["error"])
+                else:
+                    job.update_file(item["file_id"], "done", result={
+                        "image_id": item.get("image_id"),
+                        "clothing_items": item.get("clothing_items", [])
+                    })
+            job.stats = stats
+
+        job = job_store.submit("ingest", [f["name"] for f in files], handler, file_ids=[f["file_id"] for f in files])
+        return jsonify({
+            "message": "Ingest job queued",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}"
+        }), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@routes.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Reports the progress of a background job. Pass `files=1` to include
+    per-file results and errors.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({"error": "No such job"}), 404
+
+    include_files = request.args.get("files", "0").lower() in ("1", "true")
+    return jsonify(job.to_dict(include_files=include_files)), 200
@@ -0,0 +1,146 @@
+import hashlib
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+STREAM_CHUNK_SIZE = 256 * 1024
+MAX_FIELD_SIZE = 64 * 1024  # Limit for the non-file form fields of a multipart upload
+
+class UploadTooLarge(ValueError):
+    """Raised when a streamed upload goes over its size limit."""
+    pass
+
+class ChunkReader:
+    """
+    Non-seekable file object over an iterator of byte chunks.
+
+    Counts and hashes the bytes as they are read and enforces a size limit,
+    holding at most one chunk plus whatever the caller asked for in memory.
+    """
+
+    def __init__(self, chunks, max_size=None, keep_copy=False):
+        """
+        Args:
+            chunks (iterator): Yields the body as bytes.
+            max_size (int): Raise UploadTooLarge after this many bytes.
+            keep_copy (bool): Also keep every byte read in `copy`, for callers
+                that need the full contents afterwards.
+        """
+        self._chunks = chunks
+        self._pending = bytearray()
+        self._done = False
+        self.max_size = max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.copy = bytearray() if keep_copy else None
+
+    def _fill(self, size):
+        while not self._done and (size < 0 or len(self._pending) < size):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._done = True
+                break
+            self.size += len(chunk)
+            if self.max_size is not None and self.size > self.max_size:
+                raise UploadTooLarge(f"Upload exceeds the {self.max_size} byte limit")
+            self.sha256.update(chunk)
+            if self.copy is not None:
+                self.copy += chunk
+            self._pending += chunk
+
+    def peek(self, size):
+        """Return up to size bytes without consuming them."""
+        self._fill(size)
+        return bytes(self._pending[:size])
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0 or size >= len(self._pending):
+            data = bytes(self._pending)
+            self._pending.clear()
+        else:
+            data = bytes(self._pending[:size])
+            del self._pending[:size]
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+def iter_body(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield a raw request body in chunks."""
+    return iter(lambda: stream.read(chunk_size), b'')
+
+def _iter_multipart(stream, boundary, chunk_size):
+    """Turn a multipart body into ('field', name, value), ('file', name, filename, content_type),
+    ('data', bytes) and ('file_end',) events without buffering file parts."""
+    # No max_form_memory_size: werkzeug applies it to the decoder's whole buffer,
+    # file data included, so fields are limited by hand below instead
+    decoder = MultipartDecoder(boundary)
+    current = None
+    field_data = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        decoder.receive_data(chunk or None)
+        event = decoder.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, Epilogue):
+                return
+            if isinstance(event, File):
+                current = event
+                yield ('file', event.name, event.filename, event.headers.get('Content-Type'))
+            elif isinstance(event, Field):
+                current = event
+                field_data.clear()
+            elif isinstance(event, Data):
+                if isinstance(current, File):
+                    if event.data:
+                        yield ('data', event.data)
+                    if not event.more_data:
+                        yield ('file_end',)
+                else:
+                    field_data += event.data
+                    if len(field_data) > MAX_FIELD_SIZE:
+                        raise UploadTooLarge(f"Form field {current.name} is too large")
+                    if not event.more_data:
+                        yield ('field', current.name, field_data.decode('utf-8', 'replace'))
+            event = decoder.next_event()
+        if not chunk:
+            return
+
+def open_multipart_file(stream, boundary, chunk_size=STREAM_CHUNK_SIZE, max_size=None, keep_copy=False):
+    """
+    Stream the first file part of a multipart body.
+
+    Form fields that come before the file are parsed; the file itself is only
+    read as the returned reader is consumed.
+
+    Args:
+        stream: The raw request body stream.
+        boundary (bytes): Multipart boundary from the Content-Type header.
+        chunk_size (int): Bytes read from the stream at a time.
+        max_size (int): Size limit for the file.
+        keep_copy (bool): Keep the file's bytes in reader.copy.
+
+    Returns:
+        tuple: (fields, filename, content_type, reader).
+    """
+    events = _iter_multipart(stream, boundary, chunk_size)
+    fields = {}
+    for event in events:
+        if event[0] == 'field':
+            fields[event[1]] = event[2]
+        elif event[0] == 'file':
+            _, _, filename, content_type = event
+            break
+    else:
+        raise ValueError("No file part in request")
+
+    def file_chunks():
+        for event in events:
+            if event[0] == 'data':
+                yield event[1]
+            elif event[0] == 'file_end':
+                return
+
+    return fields, filename, content_type, ChunkReader(file_chunks(), max_size, keep_copy)
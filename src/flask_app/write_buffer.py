@@ -0,0 +1,113 @@
+import atexit
+import threading
+from concurrent.futures import Future
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5  # seconds
+
+class FirestoreWriteBuffer:
+    """Groups Firestore sets and updates into WriteBatch commits."""
+
+    def __init__(self, db, max_batch_size=MAX_BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        """
+        Args:
+            db (firestore.Client): Firestore client.
+            max_batch_size (int): Writes per commit; a full buffer is committed right away.
+            flush_interval (float): Seconds between background commits.
+        """
+        self.db = db
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._ops = []
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="firestore-writer")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def set(self, ref, data, merge=False):
+        """Queue a set; the returned Future resolves once it is committed."""
+        return self._add(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        """Queue an update; it fails with NotFound if the document does not exist."""
+        return self._add(("update", ref, data, None))
+
+    def _add(self, op):
+        future = Future()
+        with self._lock:
+            self._ops.append((op, future))
+            full = len(self._ops) >= self.max_batch_size
+        if full:
+            self.flush()
+        return future
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing Firestore writes: {e}")
+
+    def _apply(self, target, op):
+        kind, ref, data, merge = op
+        if kind == "set":
+            target.set(ref, data, merge=merge)
+        else:
+            target.update(ref, data)
+
+    def _commit_one(self, op, future):
+        try:
+            batch = self.db.batch()
+            self._apply(batch, op)
+            batch.commit()
+            future.set_result(True)
+        except Exception as e:
+            print(f"Error committing Firestore write to {op[1].path}: {e}")
+            future.set_exception(e)
+
+    def _commit_chunk(self, chunk):
+        batch = self.db.batch()
+        applied = []
+        for op, future in chunk:
+            # The client validates writes as they are added; a rejected one fails alone
+            try:
+                self._apply(batch, op)
+            except Exception as e:
+                print(f"Error queueing Firestore write to {op[1].path}: {e}")
+                future.set_exception(e)
+                continue
+            applied.append((op, future))
+        if not applied:
+            return
+
+        try:
+            batch.commit()
+        except Exception as e:
+            # A batch is all-or-nothing; retry one by one so a single bad write fails alone
+            print(f"Batch commit failed ({e}), committing writes individually")
+            for op, future in applied:
+                self._commit_one(op, future)
+            return
+        for _, future in applied:
+            future.set_result(True)
+
+    def flush(self):
+        """Commit every queued write, in the order the writes were queued."""
+        # Draining and committing under one lock keeps concurrent flushes from
+        # committing out of order, e.g. an update landing before the set it depends on
+        with self._commit_lock:
+            with self._lock:
+                ops, self._ops = self._ops, []
+
+            for start in range(0, len(ops), self.max_batch_size):
+                self._commit_chunk(ops[start:start + self.max_batch_size])
+
+    def close(self):
+        """Stop the background flusher and commit whatever is left."""
+        if not self._closed.is_set():
+            self._closed.set()
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
@@ -0,0 +1,151 @@
+import copy
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from src.ml_module.registry import resolve_backend
+
+# Cache settings; the on-disk tier is only used when a directory is configured
+CACHE_MAX_ITEMS = int(os.environ.get("DETECTION_CACHE_ITEMS", "256"))
+CACHE_DIR = os.environ.get("DETECTION_CACHE_DIR")
+CACHE_MAX_DISK_BYTES = int(os.environ.get("DETECTION_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Bumped whenever the shape or selection rules of a cached result change, so stale disk entries are never returned
+CACHE_FORMAT = 3
+
+class DetectionCache:
+    """Two-tier (memory LRU + optional disk) cache of detection results keyed by image content."""
+
+    def __init__(self, max_items=CACHE_MAX_ITEMS, cache_dir=CACHE_DIR, max_disk_bytes=CACHE_MAX_DISK_BYTES):
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image_bytes, pipe, threshold=0.7):
+        """
+        Build a cache key from the image content and everything that affects the detections.
+
+        Args:
+            image_bytes (bytes): Encoded image contents.
+            pipe (HumanClothesDetectionPipeline): The pipeline that produces the detections.
+            threshold (float): Threshold passed to finalize_predictions.
+
+        Returns:
+            str: Hex digest identifying the result.
+        """
+        digest = hashlib.sha256(image_bytes)
+        settings = (
+            pipe.human_model, pipe.clothing_model, resolve_backend(pipe.backend), pipe.human_threshold,
+            pipe.crop_to_human, pipe.crop_padding, pipe.crop_size, threshold, CACHE_FORMAT,
+        )
+        digest.update(repr(settings).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Return a copy of the cached result for a key, or None."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(value)
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    value = pickle.load(f)
+                # Touch the file so disk eviction is least-recently-used
+                os.utime(self._disk_path(key))
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return copy.deepcopy(value)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store a result in memory and, when configured, on disk."""
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, value)
+
+        if self.cache_dir:
+            try:
+                tmp_path = self._disk_path(key) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._disk_path(key))
+                self._evict_disk()
+            except OSError as e:
+                print(f"Error writing detection cache entry: {e}")
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # Drop the least recently used files until the tier fits its budget
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """Empty both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        """Return hit/miss counters for the cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+# Shared cache used by the processing entry points
+detection_cache = DetectionCache()
@@ -0,0 +1,239 @@
+import queue
+import threading
+import time
+
+# Default stage sizes: I/O-bound stages get many threads, inference is bounded by the worker pool
+QUEUE_SIZE = 16
+DOWNLOAD_WORKERS = 8
+CROP_WORKERS = 2
+UPLOAD_WORKERS = 8
+RECORD_WORKERS = 8  # Each waits for its buffered writes to commit; several share one batch
+RECORD_TIMEOUT = 60  # seconds
+
+_DONE = object()
+
+class Stage:
+    """One pipeline stage: a function applied to each item by a fixed number of threads."""
+
+    def __init__(self, name, fn, workers=1):
+        """
+        Args:
+            name (str): Stage name used in stats and errors.
+            fn (callable): Takes an item dict, updates it, and returns it.
+            workers (int): Number of threads running fn concurrently.
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+
+    def record(self, started, ended, ok):
+        with self._lock:
+            self.processed += ok
+            self.failed += not ok
+            self.busy_seconds += ended - started
+            self.first_start = started if self.first_start is None else min(self.first_start, started)
+            self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def stats(self):
+        with self._lock:
+            active = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+            return {
+                "workers": self.workers,
+                "processed": self.processed,
+                "failed": self.failed,
+                "busy_seconds": round(self.busy_seconds, 4),
+                "active_seconds": round(active, 4),
+                "items_per_sec": round(self.processed / active, 4) if active else 0.0,
+            }
+
+class IngestPipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Every stage works concurrently on different items, so a batch takes
+    roughly as long as its slowest stage. The bounded queues apply
+    backpressure: a fast stage blocks once the next stage falls behind, which
+    keeps the number of in-flight items (and their image buffers) bounded.
+    """
+
+    def __init__(self, stages, queue_size=QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.elapsed = 0.0
+
+    def _worker(self, stage, inbox, outbox):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Pass the sentinel on so the other workers of this stage stop too
+                inbox.put(_DONE)
+                return
+            if item.get("error") is None:
+                started = time.perf_counter()
+                try:
+                    item = stage.fn(item)
+                    ok = True
+                except Exception as e:
+                    print(f"Stage {stage.name} failed for {item.get('name')}: {e}")
+                    item["error"] = f"{stage.name}: {e}"
+                    ok = False
+                stage.record(started, time.perf_counter(), ok)
+            outbox.put(item)
+
+    def run(self, items):
+        """
+        Push items through every stage.
+
+        Args:
+            items (iterable): Item dictionaries; failed items carry an 'error'
+                and skip the remaining stages.
+
+        Returns:
+            list: The processed items, in completion order.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        stage_threads = []
+        for index, stage in enumerate(self.stages):
+            threads = [
+                threading.Thread(target=self._worker, args=(stage, queues[index], queues[index + 1]),
+                                 daemon=True, name=f"ingest-{stage.name}-{n}")
+                for n in range(stage.workers)
+            ]
+            for thread in threads:
+                thread.start()
+            stage_threads.append(threads)
+
+        results = []
+        collector = threading.Thread(target=lambda: self._collect(queues[-1], results), daemon=True)
+        collector.start()
+
+        start = time.perf_counter()
+        for item in items:
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+        # Close each stage once all of its workers have drained the queue before it
+        for index, threads in enumerate(stage_threads):
+            for thread in threads:
+                thread.join()
+            queues[index + 1].put(_DONE)
+        collector.join()
+        self.elapsed = time.perf_counter() - start
+        return results
+
+    @staticmethod
+    def _collect(outbox, results):
+        while True:
+            item = outbox.get()
+            if item is _DONE:
+                return
+            results.append(item)
+
+    def stats(self):
+        """Per-stage throughput plus the wall time of the last run."""
+        return {
+            "elapsed_seconds": round(self.elapsed, 4),
+            "stages": {stage.name: stage.stats() for stage in self.stages},
+        }
+
+def build_ingest_pipeline(use_pool=True, queue_size=QUEUE_SIZE):
+    """
+    Build the download -> detect -> crop -> upload -> record pipeline.
+
+    Items are dictionaries with the Drive 'file_id' and 'name' of a photo,
+    and optionally the Firestore 'image_id' of its Images document.
+
+    Args:
+        use_pool (bool): Run inference on the multi-process worker pool
+            instead of a single in-process pipeline.
+        queue_size (int): Capacity of the queue in front of each stage.
+
+    Returns:
+        IngestPipeline: The configured pipeline.
+    """
+    from src.flask_app.drive_utils import download_bytes
+    from src.flask_app.firestore_utils import mark_image_parsed, save_clothing_items, save_metadata_to_firestore
+    from src.ml_module.cache import detection_cache
+    from src.ml_module.main import crop_clothing, detect_clothing, upload_crop
+    from src.ml_module.pipeline import HumanClothesDetectionPipeline
+    from src.ml_module.utils import decode_image
+
+    if use_pool:
+        from src.ml_module.worker_pool import INFERENCE_JOB_TIMEOUT, get_pool
+        pool = get_pool()
+        detect_workers = pool.num_workers
+        key_pipe = HumanClothesDetectionPipeline(**pool.pipeline_kwargs)
+    else:
+        detect_workers = 1
+        key_pipe = HumanClothesDetectionPipeline()
+
+    def download(item):
+        item["image_bytes"] = download_bytes(item["file_id"])
+        return item
+
+    def detect(item):
+        if not use_pool:
+            item["detections"] = detect_clothing(key_pipe, item["image_bytes"])
+            return item
+
+        cache_key = detection_cache.make_key(item["image_bytes"], key_pipe)
+        detections = detection_cache.get(cache_key)
+        if detections is None:
+            detections = pool.submit(item["image_bytes"]).result(timeout=INFERENCE_JOB_TIMEOUT)
+            detection_cache.put(cache_key, detections)
+        item["detections"] = detections
+        return item
+
+    def crop(item):
+        image = decode_image(item.pop("image_bytes"))
+        detections = item.pop("detections")
+        item["crops"] = crop_clothing(image, detections["people"], item["name"])
+        return item
+
+    def upload(item):
+        item["clothing_items"] = [upload_crop(crop) for crop in item.pop("crops")]
+        return item
+
+    def record(item):
+        image_id = item.get("image_id")
+        if image_id is None:
+            image_id = save_metadata_to_firestore({"id": item["file_id"], "name": item["name"]})
+            item["image_id"] = image_id
+        saved = save_clothing_items(image_id, item["clothing_items"])
+        mark_image_parsed(image_id)
+        # The writes are buffered; wait for them so a missing image document fails the item
+        saved.result(timeout=RECORD_TIMEOUT)
+        return item
+
+    return IngestPipeline([
+        Stage("download", download, DOWNLOAD_WORKERS),
+        Stage("detect", detect, detect_workers),
+        Stage("crop", crop, CROP_WORKERS),
+        Stage("upload", upload, UPLOAD_WORKERS),
+        Stage("record", record, RECORD_WORKERS),
+    ], queue_size)
+
+def run_ingest(files, use_pool=True):
+    """
+    Ingest Drive photos end to end and report per-stage throughput.
+
+    Args:
+        files (list): Dictionaries with 'file_id' and 'name' (and optionally 'image_id').
+        use_pool (bool): Use the multi-process inference pool.
+
+    Returns:
+        tuple: (processed items, stats).
+    """
+    pipeline = build_ingest_pipeline(use_pool)
+    results = pipeline.run(dict(f) for f in files)
+    stats = pipeline.stats()
+    print(f"Ingested {len(results)} images in {stats['elapsed_seconds']}s")
+    for name, stage_stats in stats["stages"].items():
+        print(f"  {name}: {stage_stats['items_per_sec']} items/sec ({stage_stats['failed']} failed)")
+    return results, stats
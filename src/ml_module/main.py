@@ -1,9 +1,14 @@
 from PIL import Image
-from src.flask_app.drive_utils import upload_file
+from src.flask_app.drive_utils import upload_bytes, download_bytes, get_file_metadata
 from src.ml_module.utils import *
+import argparse
 import numpy as np
 import os
+import time
 from src.ml_module.pipeline import HumanClothesDetectionPipeline
+from src.ml_module.cache import detection_cache
+from src.ml_module.manifest import Manifest
+from src.ml_module.phash_index import dhash, get_crop_index, is_informative, mean_color, colors_match
 import cv2
 
 # Folder IDs for Google Drive
@@ -15,34 +20,68 @@ DRIVE_FOLDERS = {
     "OTHER": "1otherFolderIDHere"  # Default folder for unclassified images
 }
 
-def main():
-    image = cv2.imread(filename, cv2.IMREAD_COLOR)
-
-    if is_full_image:
-        # Upload the full image to the "FULL" folder
-        folder_id = DRIVE_FOLDERS["FULL"]
-        upload_file(filename, filename, folder_id)
-        return {"message": "Full image uploaded successfully"}
-
-    # Load the model and preprocessor
-    pipe = HumanClothesDetectionPipeline()
-
-    while True:
-        # Generate the predictions
-        # Check folder if new data, then pipe it through pipe
-        human, preds = pipe(filename)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Longest-side sizes of the WebP derivatives uploaded next to each crop, e.g. for gallery tiles
+DERIVATIVE_SIZES = tuple(int(size) for size in os.environ.get("CROP_DERIVATIVE_SIZES", "128,512").split(",") if size.strip())
+DERIVATIVE_QUALITY = int(os.environ.get("CROP_DERIVATIVE_QUALITY", "80"))
+# Seconds a duplicate crop waits for the upload of the crop it matched
+CROP_CLAIM_TIMEOUT = int(os.environ.get("CROP_CLAIM_TIMEOUT", "300"))
+
+def detect_clothing(pipe, image_bytes, image=None):
+    """
+    Run (or reuse cached) detection for one image.
+
+    Args:
+        pipe (HumanClothesDetectionPipeline): Pipeline to run on a cache miss.
+        image_bytes (bytes): Encoded image, used for the cache key.
+        image (np.ndarray): The decoded image, if already available.
+
+    Returns:
+        dict: 'people', one {'human', 'clothes', 'final'} entry per detected person.
+    """
+    # Reuse the detections if this exact image was processed before
+    cache_key = detection_cache.make_key(image_bytes, pipe)
+    cached = detection_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if image is None:
+        image = decode_image(image_bytes)
+
+    # Generate the predictions for everyone in the photo
+    people = pipe.detect_people(to_pil(image))
+
+    # Sort each person's predictions by area and select the highest per category
+    detections = {'people': finalize_people(people)}
+    detection_cache.put(cache_key, detections)
+    return detections
+
+def crop_clothing(image, people, filename):
+    """
+    Correct the detected boxes against each human box and crop each clothing item.
+
+    Args:
+        image (np.ndarray): The decoded image.
+        people (list): 'people' entries from detect_clothing.
+        filename (str): Name of the source image; crops are named after it.
+
+    Returns:
+        list: One dictionary per crop with its JPEG 'data', its WebP
+        'derivatives' keyed by size, its perceptual hash and its metadata.
+    """
+    crops = []
+    for p, person in enumerate(people):
+        try:
+            # Correct the proportions of the detections
+            corrected_predictions = correct_clothing_bounding_boxes(person['human'].values(), person['final'])
+        except Exception as e:
+            print(f'Encountered error {e} while correcting person {p}, continuing...')
+            continue
+
+        # The first person keeps the original crop names
+        suffix = "" if p == 0 else f"_p{p}"
 
-        # Sort the predictions by area size
-        preds.sort(key=lambda x: calculate_area(x['box']), reverse=True)
-
-        # Generate for each category and select the highest
-        final_predictions = finalize_predictions(preds)
-
-        # Correct the proportions of the detections
-        corrected_predictions = correct_clothing_bounding_boxes(human.values(), final_predictions)
-
-        # Process the image and upload cropped parts
-        meta_data_list = []
         for i, key in enumerate(corrected_predictions.keys()):
             if corrected_predictions[key] is None:
                 continue
@@ -53,91 +92,251 @@ def main():
 
                 xmin, ymin, xmax, ymax = corrected_predictions[key]['box'].values()
 
-                # Crop and save the image
+                # Crop as a view of the decoded image and encode it in memory
                 cropped_image = image[ymin:ymax, xmin:xmax, :]
-                cropped_file_name = filename[:-4] + f"_{i}.jpg"
-                cv2.imwrite(cropped_file_name, cropped_image)
+                cropped_file_name = filename[:-4] + f"{suffix}_{i}.jpg"
 
                 # Determine folder based on clothing type
                 clothing_type = corrected_predictions[key]['label'].upper()
                 folder_id = DRIVE_FOLDERS.get(clothing_type, DRIVE_FOLDERS["OTHER"])
 
-                # Upload the cropped image to Google Drive
-                upload_file(cropped_file_name, cropped_file_name, folder_id)
-
-                # Save the metadata
-                meta_data_list.append({
-                    'isLiked': False,
+                crops.append({
+                    'data': encode_jpeg(cropped_image),
+                    'derivatives': make_derivatives(cropped_image, DERIVATIVE_SIZES, DERIVATIVE_QUALITY),
+                    'phash': f"{dhash(cropped_image):016x}",
+                    'meanColor': mean_color(cropped_image),
                     'clothingType': clothing_type,
                     'length': ymax - ymin,
                     'width': xmax - xmin,
                     'file_name': cropped_file_name,
-                    'folder_id': folder_id
+                    'folder_id': folder_id,
+                    'person': p
                 })
             except Exception as e:
                 print(f'Encountered error {e} while cropping, continuing...')
 
-        return {"message": "Images processed and uploaded successfully", "results": meta_data_list}
-
-
-    # def service_model(filename, is_full_image=False):
-    #     image = cv2.imread(filename, cv2.IMREAD_COLOR)
-
-    #     if is_full_image:
-    #         # Upload the full image to the "FULL" folder
-    #         folder_id = DRIVE_FOLDERS["FULL"]
-    #         upload_file(filename, filename, folder_id)
-    #         return {"message": "Full image uploaded successfully"}
+    return crops
+
+def upload_crop(crop):
+    """
+    Upload a crop and its derivatives to the crop's folder.
+
+    A crop whose perceptual hash is close to an already uploaded crop of the
+    same clothing type and mean colour is not uploaded again; it reuses that
+    crop's files and is flagged with 'duplicateOf'. Crops too plain for their
+    hash to tell garments apart are always uploaded.
+
+    Args:
+        crop (dict): Output of crop_clothing; its image data is consumed.
+
+    Returns:
+        dict: Clothing item metadata with the crop's 'fileId' and the file id
+        of each derivative under 'derivatives', keyed by size.
+    """
+    crop_index = get_crop_index()
+    phash = int(crop['phash'], 16)
+    if not is_informative(phash):
+        return _upload_crop_files(crop)
+
+    def accept(match):
+        return match['clothingType'] == crop['clothingType'] and colors_match(match.get('meanColor'), crop['meanColor'])
+
+    # Claiming is atomic, so concurrent copies of a crop wait for the first upload instead of repeating it
+    claimed = crop_index.claim(phash, {'clothingType': crop['clothingType'], 'meanColor': crop['meanColor']}, accept)
+    if claimed is not None:
+        distance, future = claimed
+        match = future.result(timeout=CROP_CLAIM_TIMEOUT)
+        if match is None:
+            # The upload we waited on failed
+            return _upload_crop_files(crop)
+        crop.pop('data')
+        crop.pop('derivatives', None)
+        print(f"Crop {crop['file_name']} is {distance} bits from {match['fileId']}, skipping upload")
+        return {
+            'isLiked': False, 'fileId': match['fileId'], 'derivatives': match['derivatives'],
+            'duplicateOf': match['fileId'], **crop
+        }
+
+    try:
+        item = _upload_crop_files(crop)
+    except BaseException:
+        crop_index.release(phash)
+        raise
+    crop_index.complete(phash, {
+        'fileId': item['fileId'], 'derivatives': item['derivatives'],
+        'clothingType': crop['clothingType'], 'meanColor': crop['meanColor']
+    })
+    return item
+
+def _upload_crop_files(crop):
+    uploaded = upload_bytes(crop['file_name'], crop.pop('data'), crop['folder_id'])
+
+    derivative_ids = {}
+    for size, data in crop.pop('derivatives', {}).items():
+        try:
+            derivative = upload_bytes(crop['file_name'][:-4] + f"_{size}.webp", data, crop['folder_id'], 'image/webp')
+            # Firestore map keys must be strings
+            derivative_ids[str(size)] = derivative.get('id')
+        except Exception as e:
+            print(f'Encountered error {e} while uploading the {size}px derivative, continuing...')
+
+    return {'isLiked': False, 'fileId': uploaded.get('id'), 'derivatives': derivative_ids, **crop}
+
+def service_model(filename, is_full_image=False, image_bytes=None, uploaded=None):
+    """
+    Detect, crop and upload the clothing in one photo.
+
+    Args:
+        filename (str): Path of the photo, or its name when image_bytes is given.
+        is_full_image (bool): Upload the photo as-is to the "FULL" folder instead.
+        image_bytes (bytes): The photo's contents, if already in memory.
+        uploaded (dict): Metadata of crops uploaded by an earlier attempt, keyed
+            by crop file name; those crops are not uploaded again.
+
+    Returns:
+        dict: Message, the metadata of each uploaded crop under 'results' and
+        the file names of the crops that could not be uploaded under 'failed'.
+    """
+    # Read and decode once; every stage below works on these bytes and this array
+    if image_bytes is None:
+        with open(filename, "rb") as f:
+            image_bytes = f.read()
 
-    #     # Load the model and preprocessor
-    #     pipe = HumanClothesDetectionPipeline()
-
-    #     # Generate the predictions
-    #     human, preds = pipe(filename)
-
-    #     # Sort the predictions by area size
-    #     preds.sort(key=lambda x: calculate_area(x['box']), reverse=True)
-
-    #     # Generate for each category and select the highest
-    #     final_predictions = finalize_predictions(preds)
-
-    #     # Correct the proportions of the detections
-    #     corrected_predictions = correct_clothing_bounding_boxes(human.values(), final_predictions)
-
-    #     # Process the image and upload cropped parts
-    #     meta_data_list = []
-    #     for i, key in enumerate(corrected_predictions.keys()):
-    #         if corrected_predictions[key] is None:
-    #             continue
-
-    #         try:
-    #             for bound in corrected_predictions[key]['box'].keys():
-    #                 corrected_predictions[key]['box'][bound] = int(corrected_predictions[key]['box'][bound])
-
-    #             xmin, ymin, xmax, ymax = corrected_predictions[key]['box'].values()
-
-    #             # Crop and save the image
-    #             cropped_image = image[ymin:ymax, xmin:xmax, :]
-    #             cropped_file_name = filename[:-4] + f"_{i}.jpg"
-    #             cv2.imwrite(cropped_file_name, cropped_image)
-
-    #             # Determine folder based on clothing type
-    #             clothing_type = corrected_predictions[key]['label'].upper()
-    #             folder_id = DRIVE_FOLDERS.get(clothing_type, DRIVE_FOLDERS["OTHER"])
+    if is_full_image:
+        # Upload the full image to the "FULL" folder
+        folder_id = DRIVE_FOLDERS["FULL"]
+        upload_bytes(os.path.basename(filename), image_bytes, folder_id)
+        return {"message": "Full image uploaded successfully", "results": [], "failed": []}
 
-    #             # Upload the cropped image to Google Drive
-    #             upload_file(cropped_file_name, cropped_file_name, folder_id)
+    image = decode_image(image_bytes)
 
-    #             # Save the metadata
-    #             meta_data_list.append({
-    #                 'isLiked': False,
-    #                 'clothingType': clothing_type,
-    #                 'length': ymax - ymin,
-    #                 'width': xmax - xmin,
-    #                 'file_name': cropped_file_name,
-    #                 'folder_id': folder_id
-    #             })
-    #         except Exception as e:
-    #             print(f'Encountered error {e} while cropping, continuing...')
+    # Models are shared through the registry, so this does not reload weights
+    pipe = HumanClothesDetectionPipeline()
+    detections = detect_clothing(pipe, image_bytes, image)
+
+    # Process the image and upload cropped parts
+    uploaded = uploaded or {}
+    meta_data_list = []
+    failed = []
+    for crop in crop_clothing(image, detections['people'], filename):
+        if crop['file_name'] in uploaded:
+            meta_data_list.append(uploaded[crop['file_name']])
+            continue
+        try:
+            # Upload the cropped image and its derivatives to Google Drive, then save the metadata
+            meta_data_list.append(upload_crop(crop))
+        except Exception as e:
+            print(f'Encountered error {e} while uploading, continuing...')
+            failed.append(crop['file_name'])
+
+    message = "Images processed and uploaded successfully"
+    if failed:
+        message = f"{len(failed)} of {len(failed) + len(meta_data_list)} crops could not be uploaded"
+    return {"message": message, "results": meta_data_list, "failed": failed}
+
+def _batch_sources(sources, from_drive):
+    """
+    Yield (key, load) for every photo in the batch.
+
+    load() returns the photo's (name, bytes), with bytes None for local files.
+    Nothing is fetched until it is called, so items the manifest already has
+    cost no Drive requests.
+    """
+    for source in sources:
+        if from_drive:
+            def load(file_id=source):
+                metadata = get_file_metadata(file_id) or {}
+                size = int(metadata["size"]) if "size" in metadata else None
+                return metadata.get("name", f"{file_id}.jpg"), download_bytes(file_id, size=size)
+            yield f"drive:{source}", load
+        elif os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                path = os.path.join(source, name)
+                if os.path.isfile(path) and name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.abspath(path), lambda path=path: (path, None)
+        else:
+            yield os.path.abspath(source), lambda source=source: (source, None)
+
+def process_batch(sources, manifest_path=None, from_drive=False, is_full_image=False):
+    """
+    Process a batch of photos, checkpointing each finished one so an
+    interrupted run can resume where it stopped.
+
+    Args:
+        sources (list): Local files/directories, or Drive file ids when from_drive is set.
+        manifest_path (str): JSON-lines checkpoint file. Items recorded as done
+            in it are skipped, so their inference and uploads are not redone;
+            partial items only retry the crops that failed to upload.
+        from_drive (bool): Treat sources as Drive file ids.
+        is_full_image (bool): Upload photos to the "FULL" folder without detection.
+
+    Returns:
+        dict: Processed/skipped/failed counts, images/sec and per-image timings.
+    """
+    manifest = Manifest(manifest_path) if manifest_path else None
+    timings = {}
+    processed = skipped = failed = 0
+
+    start = time.perf_counter()
+    for key, load in _batch_sources(sources, from_drive):
+        entry = manifest.get(key) if manifest is not None else None
+        if entry is not None and entry.get("status") == "done":
+            skipped += 1
+            continue
+
+        item_start = time.perf_counter()
+        name = entry.get("name", key) if entry is not None else key
+        try:
+            name, image_bytes = load()
+            # Reuse the crops a partial earlier attempt already uploaded
+            uploaded = {}
+            if entry is not None and entry.get("status") == "partial":
+                uploaded = {item["file_name"]: item for item in entry.get("results", [])}
+            result = service_model(name, is_full_image, image_bytes, uploaded)
+            seconds = time.perf_counter() - item_start
+            if result["failed"]:
+                failed += 1
+                print(f"Failed to upload {len(result['failed'])} crops of {name}")
+            else:
+                processed += 1
+            if manifest is not None:
+                manifest.record(
+                    key, "partial" if result["failed"] else "done", name=name, seconds=seconds,
+                    results=result["results"], failed=result["failed"]
+                )
+        except Exception as e:
+            seconds = time.perf_counter() - item_start
+            failed += 1
+            print(f"Failed to process {name}: {e}")
+            if manifest is not None:
+                manifest.record(key, "failed", name=name, seconds=seconds, error=str(e))
+        timings[name] = seconds
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "processed": processed,
+        "skipped": skipped,
+        "failed": failed,
+        "elapsed_seconds": elapsed,
+        "images_per_sec": processed / elapsed if elapsed and processed else 0.0,
+        "timings": timings,
+    }
+    print(f"Processed {processed} images ({skipped} skipped, {failed} failed) "
+          f"in {elapsed:.2f}s: {report['images_per_sec']:.2f} images/sec")
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds:.3f}s")
+    return report
 
-    #     return {"message": "Images processed and uploaded successfully", "results": meta_data_list}`
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Detect, crop and upload clothing from a batch of photos.")
+    parser.add_argument("sources", nargs="+", help="Image files or directories, or Drive file ids with --drive")
+    parser.add_argument("--drive", action="store_true", help="Treat sources as Google Drive file ids")
+    parser.add_argument("--manifest", help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--full", action="store_true", help="Upload the photos to the FULL folder without detection")
+    args = parser.parse_args()
+
+    report = process_batch(args.sources, args.manifest, args.drive, args.full)
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
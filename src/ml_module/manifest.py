@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import time
+
+class Manifest:
+    """
+    Append-only JSON-lines checkpoint of completed batch items.
+
+    Each line records one finished item, so an interrupted run can be resumed
+    by skipping every key already present.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Set when the file ends in a partial line, so the next entry starts on a new one
+        self._needs_newline = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    self._needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A run killed mid-write can leave a partial last line
+                        continue
+                    self._entries[entry["key"]] = entry
+
+    def is_done(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry.get("status") == "done"
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def record(self, key, status, **data):
+        """Append an item's outcome and flush it to disk immediately."""
+        entry = {"key": key, "status": status, "recorded_at": time.time(), **data}
+        with self._lock:
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(("\n" if self._needs_newline else "") + json.dumps(entry) + "\n")
+                self._needs_newline = False
+                f.flush()
+                os.fsync(f.fileno())
+        return entry
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+import onnxruntime as ort
+import torch
+from PIL import Image
+from transformers import AutoConfig, AutoImageProcessor, AutoModelForObjectDetection
+from transformers.models.yolos.modeling_yolos import YolosObjectDetectionOutput
+
+# Export settings; YOLOS position embeddings are traced at a fixed input size
+ONNX_CACHE_DIR = os.environ.get(
+    "ONNX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dressertogo", "onnx")
+)
+ONNX_INPUT_SIZE = (512, 512)  # (height, width)
+ONNX_OPSET = 17
+ONNX_QUANTIZE = os.environ.get("ONNX_QUANTIZE", "0") == "1"
+ONNX_INTRA_OP_THREADS = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_INTER_OP_THREADS = int(os.environ.get("ONNX_INTER_OP_THREADS", "0"))
+
+def _artifact_dir(model_id, input_size, cache_dir):
+    height, width = input_size
+    return os.path.join(cache_dir, model_id.replace("/", "--"), f"{height}x{width}")
+
+def export_model(model_id, input_size=ONNX_INPUT_SIZE, cache_dir=ONNX_CACHE_DIR, quantize=ONNX_QUANTIZE):
+    """
+    Export a detector to ONNX once and return the path of the cached graph.
+
+    Args:
+        model_id (str): Hugging Face model id.
+        input_size (tuple): (height, width) the graph is traced at.
+        cache_dir (str): Directory holding exported artifacts.
+        quantize (bool): Return a dynamically int8-quantized copy of the graph.
+
+    Returns:
+        str: Path to the .onnx file.
+    """
+    artifact_dir = _artifact_dir(model_id, input_size, cache_dir)
+    os.makedirs(artifact_dir, exist_ok=True)
+    fp32_path = os.path.join(artifact_dir, "model.onnx")
+
+    if not os.path.exists(fp32_path):
+        print(f"Exporting {model_id} to ONNX: {fp32_path}")
+        model = AutoModelForObjectDetection.from_pretrained(model_id).eval()
+        dummy = torch.zeros(1, 3, *input_size)
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (dummy,),
+                tmp_path,
+                input_names=["pixel_values"],
+                output_names=["logits", "pred_boxes"],
+                dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}, "pred_boxes": {0: "batch"}},
+                opset_version=ONNX_OPSET,
+            )
+        os.replace(tmp_path, fp32_path)
+
+    if not quantize:
+        return fp32_path
+
+    int8_path = os.path.join(artifact_dir, "model.int8.onnx")
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Quantizing {model_id} to int8: {int8_path}")
+        tmp_path = int8_path + ".tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+class OnnxObjectDetector:
+    """Object detector with the same call signature and output as a transformers object-detection pipeline."""
+
+    def __init__(self, model_id, quantize=None, intra_op_threads=ONNX_INTRA_OP_THREADS,
+                 inter_op_threads=ONNX_INTER_OP_THREADS, input_size=ONNX_INPUT_SIZE, cache_dir=ONNX_CACHE_DIR):
+        self.model_id = model_id
+        self.input_size = input_size
+        quantize = ONNX_QUANTIZE if quantize is None else quantize
+        path = export_model(model_id, input_size, cache_dir, quantize)
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.processor = AutoImageProcessor.from_pretrained(model_id)
+        self.id2label = AutoConfig.from_pretrained(model_id).id2label
+
+    def __call__(self, images, batch_size=1, threshold=0.5):
+        single = not isinstance(images, list)
+        if single:
+            images = [images]
+
+        height, width = self.input_size
+        results = []
+        for start in range(0, len(images), batch_size):
+            chunk = [
+                image if isinstance(image, Image.Image) else Image.open(image).convert("RGB")
+                for image in images[start:start + batch_size]
+            ]
+            inputs = self.processor(images=chunk, size={"height": height, "width": width}, return_tensors="np")
+            # The graph also returns last_hidden_state, so fetch only the outputs we need
+            logits, pred_boxes = self.session.run(
+                ["logits", "pred_boxes"], {"pixel_values": inputs["pixel_values"].astype(np.float32)}
+            )
+
+            outputs = YolosObjectDetectionOutput(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes))
+            target_sizes = torch.tensor([(image.height, image.width) for image in chunk])
+            processed = self.processor.post_process_object_detection(
+                outputs, threshold=threshold, target_sizes=target_sizes
+            )
+
+            for detections in processed:
+                results.append([
+                    {
+                        "score": score.item(),
+                        "label": self.id2label[label.item()],
+                        "box": {
+                            "xmin": int(box[0]),
+                            "ymin": int(box[1]),
+                            "xmax": int(box[2]),
+                            "ymax": int(box[3]),
+                        },
+                    }
+                    for score, label, box in zip(detections["scores"], detections["labels"], detections["boxes"])
+                ])
+
+        return results[0] if single else results
@@ -0,0 +1,247 @@
+import json
+import os
+import threading
+from concurrent.futures import Future
+from itertools import combinations
+
+import cv2
+
+# Index settings; distances are in bits of the 64-bit difference hash
+CROP_HASH_INDEX_PATH = os.environ.get("CROP_HASH_INDEX_PATH", "crop_hashes.jsonl")
+CROP_HASH_DISTANCE = int(os.environ.get("CROP_HASH_DISTANCE", "6"))
+HASH_BITS = 64
+HASH_CHUNKS = 4
+# Flat or plain crops hash to (nearly) all zeros or ones, which says nothing about the garment
+MIN_HASH_BITS = 8
+# Largest per-channel difference of mean colours for two crops to count as the same garment
+CROP_COLOR_TOLERANCE = int(os.environ.get("CROP_COLOR_TOLERANCE", "24"))
+
+_index = None
+_init_lock = threading.Lock()
+
+def dhash(image, hash_size=8):
+    """
+    Compute the difference hash of an image.
+
+    Args:
+        image (np.ndarray): BGR (or grayscale) image, or a view of one.
+        hash_size (int): Hash side length; the hash has hash_size ** 2 bits.
+
+    Returns:
+        int: The hash; near-identical images differ in only a few bits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+def is_informative(value, min_bits=MIN_HASH_BITS):
+    """Whether a hash has enough structure to identify a near-duplicate."""
+    bits = bin(value).count("1")
+    return min_bits <= bits <= HASH_BITS - min_bits
+
+def mean_color(image):
+    """Mean colour of a BGR image as [r, g, b] ints."""
+    blue, green, red = cv2.mean(image)[:3]
+    return [round(red), round(green), round(blue)]
+
+def colors_match(a, b, tolerance=CROP_COLOR_TOLERANCE):
+    return a is not None and b is not None and max(abs(x - y) for x, y in zip(a, b)) <= tolerance
+
+def _masks(bits, radius):
+    """Every bits-wide XOR mask with at most radius bits set."""
+    masks = [0]
+    for count in range(1, radius + 1):
+        for positions in combinations(range(bits), count):
+            mask = 0
+            for position in positions:
+                mask |= 1 << position
+            masks.append(mask)
+    return masks
+
+class PerceptualHashIndex:
+    """
+    Multi-index hash table for Hamming-distance lookups of 64-bit image hashes.
+
+    Each hash is split into HASH_CHUNKS chunks, each with its own table. Two
+    hashes within distance d must agree to within d // HASH_CHUNKS bits on at
+    least one chunk, so a lookup only probes those few neighbouring buckets and
+    verifies the candidates instead of scanning every stored hash. Entries are
+    appended to a JSON-lines file and reloaded on start.
+    """
+
+    def __init__(self, path=None, max_distance=CROP_HASH_DISTANCE, chunks=HASH_CHUNKS):
+        self.path = path
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self._chunk_mask = (1 << self.chunk_bits) - 1
+        self._tables = [{} for _ in range(chunks)]
+        self._entries = {}
+        # Hashes claimed by an upload still in progress -> (Future, provisional data)
+        self._pending = {}
+        self._probe_masks = {}
+        self._lock = threading.Lock()
+        # Set when the file ends in a partial line, so the next entry starts on a new one
+        self._needs_newline = False
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    self._needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A process killed mid-write can leave a partial last line
+                        continue
+                    self._insert(int(entry["hash"], 16), entry["value"])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _split(self, value):
+        return [(value >> (i * self.chunk_bits)) & self._chunk_mask for i in range(self.chunks)]
+
+    def _add_to_tables(self, value):
+        if value not in self._entries and value not in self._pending:
+            for table, chunk in zip(self._tables, self._split(value)):
+                table.setdefault(chunk, []).append(value)
+
+    def _remove_from_tables(self, value):
+        for table, chunk in zip(self._tables, self._split(value)):
+            bucket = table.get(chunk)
+            if bucket and value in bucket:
+                bucket.remove(value)
+
+    def _insert(self, value, data):
+        self._add_to_tables(value)
+        self._entries[value] = data
+
+    def _persist(self, value, data):
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(("\n" if self._needs_newline else "") + json.dumps({"hash": f"{value:016x}", "value": data}) + "\n")
+                self._needs_newline = False
+
+    def add(self, value, data):
+        """
+        Store a hash with its data, replacing the data of an identical hash.
+
+        Args:
+            value (int): 64-bit perceptual hash.
+            data (dict): JSON-serializable data returned by lookups.
+        """
+        with self._lock:
+            self._insert(value, data)
+            self._persist(value, data)
+
+    def claim(self, value, data, accept=None, max_distance=None):
+        """
+        Atomically find a near-duplicate, or claim the hash while its file is uploaded.
+
+        Uploads in progress are matched too, so concurrent copies of the same
+        crop wait for the first upload instead of all uploading.
+
+        Args:
+            value (int): 64-bit perceptual hash.
+            data (dict): Provisional data for the claim, passed to accept by later lookups.
+            accept (callable): Called with a candidate's data; only accepted candidates match.
+            max_distance (int): Largest distance to match; defaults to the index's threshold.
+
+        Returns:
+            tuple: (distance, Future) for the closest accepted match, the Future
+            resolving to its data (or None if its upload failed); or None when
+            the caller now holds the claim and must call complete() or release().
+        """
+        with self._lock:
+            for distance, candidate, candidate_data in self._query_locked(value, max_distance, pending=True):
+                if isinstance(candidate_data, Future):
+                    future, candidate_data = candidate_data, self._pending[candidate][1]
+                else:
+                    future = Future()
+                    future.set_result(candidate_data)
+                if accept is None or accept(candidate_data):
+                    return distance, future
+
+            if value not in self._pending:
+                self._add_to_tables(value)
+                self._pending[value] = (Future(), data)
+            return None
+
+    def complete(self, value, data):
+        """Store the data for a claimed hash and hand it to everyone waiting on the claim."""
+        with self._lock:
+            # The claim already put the hash in the tables; inserting while it is still pending keeps one copy
+            self._insert(value, data)
+            future, _ = self._pending.pop(value, (None, None))
+            self._persist(value, data)
+        if future is not None:
+            future.set_result(data)
+
+    def release(self, value):
+        """Drop a claim whose upload failed; waiters receive None."""
+        with self._lock:
+            future, _ = self._pending.pop(value, (None, None))
+            if value not in self._entries:
+                self._remove_from_tables(value)
+        if future is not None:
+            future.set_result(None)
+
+    def query(self, value, max_distance=None):
+        """
+        Find every stored hash within a Hamming distance.
+
+        Args:
+            value (int): 64-bit perceptual hash.
+            max_distance (int): Largest distance to return; defaults to the index's threshold.
+
+        Returns:
+            list: (distance, hash, data) tuples, closest first.
+        """
+        with self._lock:
+            return self._query_locked(value, max_distance)
+
+    def _query_locked(self, value, max_distance=None, pending=False):
+        max_distance = self.max_distance if max_distance is None else max_distance
+        radius = max_distance // self.chunks
+        masks = self._probe_masks.get(radius)
+        if masks is None:
+            masks = self._probe_masks.setdefault(radius, _masks(self.chunk_bits, radius))
+
+        candidates = set()
+        for table, chunk in zip(self._tables, self._split(value)):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+
+        matches = []
+        for candidate in candidates:
+            distance = hamming(value, candidate)
+            if distance > max_distance:
+                continue
+            if candidate in self._entries:
+                matches.append((distance, candidate, self._entries[candidate]))
+            elif pending:
+                # Claimed but not uploaded yet; callers wait on its Future
+                matches.append((distance, candidate, self._pending[candidate][0]))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def nearest(self, value, max_distance=None):
+        """Return the closest (distance, hash, data) within the threshold, or None."""
+        matches = self.query(value, max_distance)
+        return matches[0] if matches else None
+
+def get_crop_index():
+    """Return the shared crop hash index, loading it from disk on first use."""
+    global _index
+    if _index is None:
+        with _init_lock:
+            if _index is None:
+                _index = PerceptualHashIndex(CROP_HASH_INDEX_PATH)
+    return _index
@@ -1,40 +1,175 @@
-from transformers import pipeline
 from PIL import Image
-import cv2
-import matplotlib.pyplot as plt
+from src.ml_module.registry import get_model, HUMAN_MODEL, CLOTHING_MODEL, DEFAULT_BACKEND
+from src.ml_module.utils import assign_to_people, calculate_area
 
 class TooManyHumansException(Exception):
     """Custom exception for too many humans detected."""
     pass
 
+class NoHumanDetectedException(Exception):
+    """Custom exception for images without a confidently detected human."""
+    pass
+
 # Define a custom pipeline class
 class HumanClothesDetectionPipeline:
-    def __init__(self):
-        # Load the first model for human detection
-        self.human_pipe = pipeline("object-detection", model="hustvl/yolos-tiny", accelerator='ort')
-        self.clothing_pipe = pipeline("object-detection", model="valentinafeve/yolos-fashionpedia", accelerator='ort')
+    def __init__(self, human_model=HUMAN_MODEL, clothing_model=CLOTHING_MODEL, human_threshold=0.9,
+                 crop_to_human=False, crop_padding=0.1, crop_size=None, backend=DEFAULT_BACKEND):
+        """
+        Args:
+            human_model (str): Model id for the person detector.
+            clothing_model (str): Model id for the clothing detector.
+            human_threshold (float): Minimum score for a person detection.
+            crop_to_human (bool): Run the clothing detector on the human crop
+                instead of the full frame.
+            crop_padding (float): Fraction of the human box added on each side
+                of the crop.
+            crop_size (tuple): Optional (width, height) the crop is resized to
+                before clothing detection.
+            backend (str): "torch", "onnx", "onnx-fp32" or "onnx-int8".
+        """
+        # Models are loaded once per process by the registry
+        self.human_model = human_model
+        self.clothing_model = clothing_model
+        self.human_threshold = human_threshold
+        self.crop_to_human = crop_to_human
+        self.crop_padding = crop_padding
+        self.crop_size = crop_size
+        self.backend = backend
 
-    def __call__(self, image_path):
-        # Step 1: Detect humans
-        humans = self.human_pipe(image_path)
+    @property
+    def human_pipe(self):
+        return get_model(self.human_model, self.backend)
+
+    @property
+    def clothing_pipe(self):
+        return get_model(self.clothing_model, self.backend)
 
-        # Filter out detections with low confidence
+    def _human_boxes(self, humans):
+        # Filter out detections with low confidence, largest person first
         human_boxes = [
             detection["box"]
             for detection in humans
-            if detection["score"] >= 0.9 and detection["label"] == "person"
+            if detection["score"] >= self.human_threshold and detection["label"] == "person"
+        ]
+        human_boxes.sort(key=calculate_area, reverse=True)
+        return human_boxes
+
+    def _select_human(self, humans):
+        human_boxes = self._human_boxes(humans)
+        if not human_boxes:
+            raise NoHumanDetectedException("No human detected in image")
+        return human_boxes[0]
+
+    def _crop_human(self, image, box):
+        """Crop the padded human box out of the image, returning the crop and how to map it back."""
+        width, height = image.size
+        pad_x = (box["xmax"] - box["xmin"]) * self.crop_padding
+        pad_y = (box["ymax"] - box["ymin"]) * self.crop_padding
+        left = max(0, int(box["xmin"] - pad_x))
+        top = max(0, int(box["ymin"] - pad_y))
+        right = min(width, int(box["xmax"] + pad_x))
+        bottom = min(height, int(box["ymax"] + pad_y))
+
+        crop = image.crop((left, top, right, bottom))
+        scale_x = scale_y = 1.0
+        if self.crop_size is not None:
+            scale_x = crop.width / self.crop_size[0]
+            scale_y = crop.height / self.crop_size[1]
+            crop = crop.resize(self.crop_size, Image.BILINEAR)
+        return crop, (left, top, scale_x, scale_y)
+
+    def _to_full_frame(self, clothes, transform):
+        """Map clothing boxes detected on a crop back to full-image coordinates."""
+        left, top, scale_x, scale_y = transform
+        for detection in clothes:
+            box = detection["box"]
+            detection["box"] = {
+                "xmin": int(box["xmin"] * scale_x) + left,
+                "ymin": int(box["ymin"] * scale_y) + top,
+                "xmax": int(box["xmax"] * scale_x) + left,
+                "ymax": int(box["ymax"] * scale_y) + top,
+            }
+        return clothes
+
+    def _union_box(self, boxes):
+        return {
+            "xmin": min(box["xmin"] for box in boxes),
+            "ymin": min(box["ymin"] for box in boxes),
+            "xmax": max(box["xmax"] for box in boxes),
+            "ymax": max(box["ymax"] for box in boxes),
+        }
+
+    def _detect_clothes(self, images, human_boxes, batch_size=1):
+        """Run the clothing detector once per image, on the region covering every person in crop mode."""
+        if not self.crop_to_human:
+            return self.clothing_pipe(images, batch_size=batch_size)
+
+        crops, transforms = [], []
+        for image, boxes in zip(images, human_boxes):
+            image = image if isinstance(image, Image.Image) else Image.open(image).convert("RGB")
+            crop, transform = self._crop_human(image, self._union_box(boxes))
+            crops.append(crop)
+            transforms.append(transform)
+        return [
+            self._to_full_frame(image_clothes, transform)
+            for image_clothes, transform in zip(self.clothing_pipe(crops, batch_size=batch_size), transforms)
         ]
-            
-        # Count the number of humans detected
-        human_count = len(human_boxes)
-        if human_count > 2:
-            print(f"Too many humans detected: {human_count}")
 
-        # Crop human regions
-        box = human_boxes[0]
+    def __call__(self, image_path):
+        # Step 1: Detect humans
+        humans = self.human_pipe(image_path)
+        box = self._select_human(humans)
 
-        # Step 2: Detect clothes within each cropped region
-        clothes = self.clothing_pipe(image_path)
+        # Step 2: Detect clothes within the human region
+        clothes = self._detect_clothes([image_path], [[box]])[0]
 
         # Combine results
-        return box, clothes
\ No newline at end of file
+        return box, clothes
+
+    def detect_people(self, image):
+        """
+        Detect every person in an image and the clothes each one is wearing.
+
+        Both detectors run once; clothing boxes are then assigned to people by
+        how much of each box lies inside each human box.
+
+        Args:
+            image: Image path or PIL image.
+
+        Returns:
+            list: One {'human': box, 'clothes': detections} per person, largest first.
+        """
+        human_boxes = self._human_boxes(self.human_pipe(image))
+        if not human_boxes:
+            return []
+        clothes = self._detect_clothes([image], [human_boxes])[0]
+        return assign_to_people(human_boxes, clothes)
+
+    def batch(self, images, batch_size=8):
+        """
+        Run both detectors over many images in micro-batches.
+
+        Args:
+            images (list): Image paths or PIL images.
+            batch_size (int): Number of images sent through a model at once.
+
+        Returns:
+            list: One (box, clothes) tuple per image, in input order. Images
+            without a confident human get (None, []) so one bad photo does not
+            abort the rest of the batch.
+        """
+        images = list(images)
+        if not images:
+            return []
+
+        humans = self.human_pipe(images, batch_size=batch_size)
+        boxes = [(self._human_boxes(image_humans) or [None])[0] for image_humans in humans]
+
+        # Only images with a human go through the clothing detector
+        found = [i for i, box in enumerate(boxes) if box is not None]
+        results = [(None, []) for _ in images]
+        if found:
+            clothes = self._detect_clothes([images[i] for i in found], [[boxes[i]] for i in found], batch_size)
+            for i, image_clothes in zip(found, clothes):
+                results[i] = (boxes[i], image_clothes)
+        return results
@@ -0,0 +1,89 @@
+import os
+import threading
+
+# Model ids used by the detection pipeline
+HUMAN_MODEL = "hustvl/yolos-tiny"
+CLOTHING_MODEL = "valentinafeve/yolos-fashionpedia"
+DEFAULT_MODELS = (HUMAN_MODEL, CLOTHING_MODEL)
+
+# Inference backend: "torch" (transformers pipeline), "onnx" (onnxruntime session, int8 if
+# ONNX_QUANTIZE=1) or "onnx-fp32"/"onnx-int8" to pick the ONNX graph explicitly
+BACKENDS = ("torch", "onnx", "onnx-fp32", "onnx-int8")
+DEFAULT_BACKEND = os.environ.get("DETECTION_BACKEND", "torch")
+
+# Loaded models keyed by (model_id, backend), shared by every caller in this process
+_models = {}
+_lock = threading.RLock()
+
+def _load(model_id, backend):
+    print(f"Loading model: {model_id} ({backend})")
+    if backend in ("onnx-fp32", "onnx-int8"):
+        from src.ml_module.onnx_backend import OnnxObjectDetector
+        return OnnxObjectDetector(model_id, quantize=backend == "onnx-int8")
+    if backend == "torch":
+        # Imported here so that importing the registry does not pull in torch
+        from transformers import pipeline
+        return pipeline("object-detection", model=model_id)
+    raise ValueError(f"Unknown detection backend: {backend}")
+
+def resolve_backend(backend):
+    """Return the backend a model is actually loaded with, resolving "onnx" to its precision."""
+    # Keyed by precision so fp32 and int8 sessions (and their cached results) are never mixed up
+    if backend == "onnx":
+        return "onnx-int8" if os.environ.get("ONNX_QUANTIZE", "0") == "1" else "onnx-fp32"
+    return backend
+
+def get_model(model_id, backend=DEFAULT_BACKEND):
+    """
+    Return the loaded object-detection model, loading it on first use.
+
+    Args:
+        model_id (str): Hugging Face model id.
+        backend (str): One of BACKENDS.
+
+    Returns:
+        Callable: The shared detector for the model.
+    """
+    key = (model_id, resolve_backend(backend))
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        # Another thread may have finished loading while we waited
+        model = _models.get(key)
+        if model is None:
+            model = _load(*key)
+            _models[key] = model
+        return model
+
+def warm_up(model_ids=DEFAULT_MODELS, backend=DEFAULT_BACKEND):
+    """Load the given models ahead of the first request."""
+    for model_id in model_ids:
+        get_model(model_id, backend)
+
+def evict(model_id=None, backend=None):
+    """
+    Drop a loaded model so its weights can be freed.
+
+    Args:
+        model_id (str): Model to drop. Drops every loaded model if omitted.
+        backend (str): Only drop this backend's copy. Drops all backends if omitted.
+    """
+    with _lock:
+        for key in list(_models.keys()):
+            if (model_id is None or key[0] == model_id) and (backend is None or key[1] == resolve_backend(backend)):
+                del _models[key]
+
+def reload(model_id, backend=DEFAULT_BACKEND):
+    """Load a fresh copy of a model and swap it in for new callers."""
+    key = (model_id, resolve_backend(backend))
+    model = _load(*key)
+    with _lock:
+        _models[key] = model
+    return model
+
+def loaded_models():
+    """Return the (model_id, backend) pairs currently held in memory."""
+    with _lock:
+        return list(_models.keys())
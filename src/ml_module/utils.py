@@ -1,5 +1,7 @@
 import cv2
+import numpy as np
 from functools import reduce
+from PIL import Image
 
 cat_list = [
     'shirt, blouse', 'top, t-shirt, sweatshirt', 'sweater', 'cardigan', 'jacket', 'vest', 
@@ -16,6 +18,72 @@ categories = {
     'boots': ['leg warmer', 'tights, stockings', 'shoe']
 }
 
+# Position of each label's key in categories
+category_groups = {label: group for group, names in enumerate(categories.values()) for label in names}
+
+# Clothing detections scoring below this are ignored; the detectors' own default cut-off
+MIN_CLOTHING_SCORE = 0.5
+
+def decode_image(source):
+    """
+    Decode an image once into a BGR array shared by every pipeline stage.
+
+    Args:
+        source (str | bytes): Path to the image or its encoded bytes.
+
+    Returns:
+        np.ndarray: The decoded image.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        image = cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        image = cv2.imread(source, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+def to_pil(image):
+    """Wrap a decoded BGR array as an RGB PIL image for the transformers pipelines."""
+    return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+def encode_jpeg(image, quality=95):
+    """Encode an array (or a view of one) straight to JPEG bytes in memory."""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return buffer.tobytes()
+
+def make_derivatives(image, sizes, quality=80):
+    """
+    Build downscaled WebP copies of an image in a single resize cascade.
+
+    Each size is resized from the previous (larger) level rather than from the
+    original, so the total resize work stays close to that of the largest size.
+    Images are never upscaled.
+
+    Args:
+        image (np.ndarray): The decoded image (or a view of one).
+        sizes (iterable): Target lengths of the longest side, in pixels.
+        quality (int): WebP quality.
+
+    Returns:
+        dict: WebP bytes keyed by size.
+    """
+    derivatives = {}
+    level = image
+    for size in sorted(set(sizes), reverse=True):
+        height, width = level.shape[:2]
+        scale = size / max(height, width, 1)
+        if scale < 1:
+            level = cv2.resize(
+                level, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA
+            )
+        ok, buffer = cv2.imencode('.webp', level, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        if not ok:
+            raise ValueError("Could not encode image")
+        derivatives[size] = buffer.tobytes()
+    return derivatives
+
 def correct_clothing_bounding_boxes(human_bbox, clothes):
     # Extract the coordinates of the human bounding box
     hxmin, hymin, hxmax, hymax = human_bbox
@@ -77,19 +145,205 @@ def calculate_area(pred):
 def subset_categories(preds, cat):
     return [pred for pred in preds if pred['label'] in cat]
 
-def finalize_predictions(preds, threshold=0.7):
-    selected = {'head': None, 'body': None, 'pants': None, 'boots': None}
-    for key in categories.keys():
-        try:
-            subset = subset_categories(preds, categories[key])
-            selected[key] = subset[0]
+class Detections:
+    """Array-backed detections: boxes as (N, 4) xmin/ymin/xmax/ymax, scores and category ids."""
 
-        except Exception as e:
-            print(f"Encountered error {e}, continuing...")
-    
+    def __init__(self, boxes, scores, category_ids, labels):
+        self.boxes = boxes
+        self.scores = scores
+        self.category_ids = category_ids
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.scores)
+
+    @classmethod
+    def from_preds(cls, preds):
+        """Build from the list of dicts returned by the object-detection pipeline."""
+        if not preds:
+            return cls(np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32),
+                       np.zeros(0, dtype=np.int64), [])
+        ids = {}
+        values = []
+        for p in preds:
+            box = p['box']
+            values += (box['xmin'], box['ymin'], box['xmax'], box['ymax'], p['score'], ids.setdefault(p['label'], len(ids)))
+        # One flat conversion is several times faster than building each column separately
+        table = np.array(values, dtype=np.float64).reshape(-1, 6)
+        return cls(table[:, :4].astype(np.float32), table[:, 4].astype(np.float32),
+                   table[:, 5].astype(np.int64), list(ids))
+
+    def to_pred(self, index):
+        """Return a single detection in the pipeline's dict format."""
+        xmin, ymin, xmax, ymax = self.boxes[index].tolist()
+        return {
+            'score': float(self.scores[index]),
+            'label': self.labels[self.category_ids[index]],
+            'box': {'xmin': int(xmin), 'ymin': int(ymin), 'xmax': int(xmax), 'ymax': int(ymax)}
+        }
+
+    def to_preds(self):
+        return [self.to_pred(i) for i in range(len(self))]
+
+    def select(self, indices):
+        return Detections(self.boxes[indices], self.scores[indices], self.category_ids[indices], self.labels)
+
+    def in_labels(self, names):
+        """Boolean mask of detections whose label is one of names."""
+        member = np.array([label in names for label in self.labels], dtype=bool)
+        return member[self.category_ids]
+
+def box_areas(boxes):
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+def pairwise_iou(boxes1, boxes2):
+    """IoU between every box in boxes1 (N, 4) and every box in boxes2 (M, 4), as an (N, M) array."""
+    # Per-coordinate 2-D arrays are several times faster than one (N, M, 2) array
+    width = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+    height = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+    intersection = np.clip(width, 0, None) * np.clip(height, 0, None)
+    union = box_areas(boxes1)[:, None] + box_areas(boxes2)[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union != 0)
+
+def nms(boxes, scores, category_ids, iou_threshold=0.5):
+    """
+    Class-aware non-maximum suppression.
+
+    Only boxes of the same category suppress each other, so each category is
+    processed on its own small IoU matrix. The greedy pass works on each row
+    packed into an integer bit mask instead of on array rows.
+
+    Args:
+        boxes (np.ndarray): (N, 4) boxes.
+        scores (np.ndarray): (N,) scores.
+        category_ids (np.ndarray): (N,) category ids.
+        iou_threshold (float): Boxes overlapping a kept box above this are dropped.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, highest score first.
+    """
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Grouped by category, highest score first within each
+    order = np.lexsort((-scores, category_ids))
+    starts = np.flatnonzero(np.diff(category_ids[order])) + 1
+    keep = []
+    for group in np.split(order, starts):
+        overlaps = np.triu(pairwise_iou(boxes[group], boxes[group]) > iou_threshold, k=1)
+        masks = np.packbits(overlaps, axis=1, bitorder='little')
+        suppressed = 0
+        for position, mask in enumerate(masks):
+            if not suppressed >> position & 1:
+                keep.append(group[position])
+                suppressed |= int.from_bytes(mask.tobytes(), 'little')
+
+    keep = np.sort(np.array(keep, dtype=np.int64))
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+def _largest_per_category(areas, groups):
+    """Index of the largest box of each key in categories, or None; ignored boxes have area -inf."""
+    selected = dict.fromkeys(categories)
+    keys = list(categories)
+    # After a stable sort by descending area, the first box of each group is its largest
+    order = np.argsort(-areas, kind='stable')
+    firsts, positions = np.unique(groups[order], return_index=True)
+    for group, position in zip(firsts.tolist(), positions.tolist()):
+        if group >= 0 and areas[order[position]] > -np.inf:
+            selected[keys[group]] = int(order[position])
+    return selected
+
+def _drop_overlapping_pants(selected):
     if selected['pants'] is not None and selected['body'] is not None:
         overlap_iou = iou(selected['body']['box'], selected['pants']['box'])
         selected['pants'] = None if overlap_iou > 0.5 else selected['pants']
-
     return selected
-    
\ No newline at end of file
+
+def finalize_detections(detections, threshold=0.7, min_score=MIN_CLOTHING_SCORE):
+    """
+    Pick the largest confident detection for each clothing category.
+
+    Low-score boxes are masked out first, then a per-category argmax of box
+    area picks the winners, matching the area-sorted order the pipeline used
+    before.
+
+    Args:
+        detections (Detections): All clothing detections for the image.
+        threshold (float): Unused; part of the detection cache key.
+        min_score (float): Detections scoring below this are ignored.
+
+    Returns:
+        dict: Category -> selected detection dict, or None.
+    """
+    if len(detections) == 0:
+        return dict.fromkeys(categories)
+
+    groups = np.array([category_groups.get(label, -1) for label in detections.labels])[detections.category_ids]
+    areas = np.where(detections.scores >= min_score, box_areas(detections.boxes), -np.inf)
+    selected = {
+        key: None if index is None else detections.to_pred(index)
+        for key, index in _largest_per_category(areas, groups).items()
+    }
+    return _drop_overlapping_pants(selected)
+
+def finalize_predictions(preds, threshold=0.7, min_score=MIN_CLOTHING_SCORE):
+    """Same as finalize_detections, for the pipeline's list of dicts; returns the selected dicts themselves."""
+    # Only the area and category of the confident boxes are needed, so each dict is read once
+    candidates, areas, groups = [], [], []
+    for pred in preds:
+        group = category_groups.get(pred['label'])
+        if group is None or pred['score'] < min_score:
+            continue
+        candidates.append(pred)
+        areas.append(calculate_area(pred['box']))
+        groups.append(group)
+    areas = np.array(areas, dtype=np.float64)
+    groups = np.array(groups, dtype=np.int64)
+    selected = {
+        key: None if index is None else candidates[index]
+        for key, index in _largest_per_category(areas, groups).items()
+    }
+    return _drop_overlapping_pants(selected)
+
+def assign_to_people(human_boxes, preds, min_containment=0.5):
+    """
+    Assign clothing detections to the person whose box contains them.
+
+    Containment (the share of a clothing box inside a human box) is computed
+    for every clothing/person pair at once; IoU breaks ties between people
+    who both contain an item, e.g. when they overlap in a group photo.
+
+    Args:
+        human_boxes (list): Human bounding boxes.
+        preds (list): Clothing detections for the whole image.
+        min_containment (float): Items less contained than this in every
+            person are dropped.
+
+    Returns:
+        list: One {'human': box, 'clothes': detections} per human box, in the same order.
+    """
+    people = [{'human': box, 'clothes': []} for box in human_boxes]
+    if not people or not preds:
+        return people
+
+    detections = Detections.from_preds(preds)
+    humans = np.array(
+        [[box['xmin'], box['ymin'], box['xmax'], box['ymax']] for box in human_boxes], dtype=np.float32
+    )
+    top_left = np.maximum(detections.boxes[:, None, :2], humans[None, :, :2])
+    bottom_right = np.minimum(detections.boxes[:, None, 2:], humans[None, :, 2:])
+    intersection = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    containment = intersection / np.maximum(box_areas(detections.boxes), 1e-6)[:, None]
+
+    owners = np.argmax(containment + pairwise_iou(detections.boxes, humans), axis=1)
+    assigned = containment[np.arange(len(preds)), owners] >= min_containment
+    for index in np.flatnonzero(assigned):
+        people[owners[index]]['clothes'].append(preds[index])
+    return people
+
+def finalize_people(people):
+    """Sort each person's clothes by area and select their final per-category predictions."""
+    for person in people:
+        person['clothes'].sort(key=lambda x: calculate_area(x['box']), reverse=True)
+        person['final'] = finalize_predictions(person['clothes'])
+    return people
@@ -0,0 +1,304 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+# Pool settings; by default one single-threaded worker per core
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_TORCH_THREADS = int(os.environ.get("INFERENCE_TORCH_THREADS", "1"))
+MAX_JOB_ATTEMPTS = 2
+# Longest a caller waits for one result, so a lost job cannot block it forever
+INFERENCE_JOB_TIMEOUT = float(os.environ.get("INFERENCE_JOB_TIMEOUT", "300"))
+# A worker that dies before loading its models is respawned after an exponential
+# backoff; after this many failures in a row the environment is assumed broken
+MAX_STARTUP_FAILURES = 5
+STARTUP_BACKOFF = 0.5
+STARTUP_BACKOFF_MAX = 30.0
+
+class WorkerCrashedException(Exception):
+    """Raised for a job whose worker process died while running it."""
+    pass
+
+class PoolBrokenException(Exception):
+    """Raised for every job of a pool whose workers keep failing to start."""
+    pass
+
+def run_detection(pipe, image):
+    """
+    Run detection and post-processing for one image.
+
+    Args:
+        pipe (HumanClothesDetectionPipeline): Loaded pipeline.
+        image (str | bytes): Image path or encoded image bytes.
+
+    Returns:
+        dict: 'people', the raw and finalized detections of each person.
+    """
+    from src.ml_module.utils import decode_image, finalize_people, to_pil
+
+    return {'people': finalize_people(pipe.detect_people(to_pil(decode_image(image))))}
+
+def _worker_main(index, jobs, results, current, torch_threads, pipeline_kwargs):
+    # Each worker owns its models and a fixed slice of the machine's cores
+    import torch
+    from src.ml_module.pipeline import HumanClothesDetectionPipeline
+    from src.ml_module.registry import warm_up
+
+    torch.set_num_threads(torch_threads)
+    pipe = HumanClothesDetectionPipeline(**pipeline_kwargs)
+    warm_up((pipe.human_model, pipe.clothing_model), backend=pipe.backend)
+    # Each worker has its own pipe, written directly rather than through a queue's
+    # feeder thread, so a result is never lost when the worker dies right after
+    # sending it and a worker dying mid-send cannot block the others
+    results.send(("ready", index, None, None))
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, image = job
+        # Shared memory, so the parent sees the job even if this process dies before any message is sent
+        current[index] = job_id
+        try:
+            message = ("done", index, job_id, run_detection(pipe, image))
+        except Exception as e:
+            message = ("error", index, job_id, f"{type(e).__name__}: {e}")
+        results.send(message)
+        current[index] = -1
+
+class InferencePool:
+    """Pool of inference processes, each holding its own loaded models."""
+
+    def __init__(self, num_workers=INFERENCE_WORKERS, torch_threads=INFERENCE_TORCH_THREADS, **pipeline_kwargs):
+        """
+        Args:
+            num_workers (int): Number of worker processes.
+            torch_threads (int): torch intra-op threads per worker.
+            **pipeline_kwargs: Passed to HumanClothesDetectionPipeline in each worker.
+        """
+        self.num_workers = num_workers
+        self.torch_threads = torch_threads
+        self.pipeline_kwargs = pipeline_kwargs
+
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs = self._context.Queue()
+        # Id of the job each worker is running, or -1
+        self._current = self._context.Array("q", [-1] * num_workers, lock=False)
+        # Live workers by slot, the read end of each one's result pipe, and the
+        # slots that have loaded their models
+        self._workers = {}
+        self._results = {}
+        self._ready = set()
+        # Consecutive startup failures and scheduled respawn time of each dead slot
+        self._startup_failures = [0] * num_workers
+        self._respawn_at = {}
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._broken = None
+        self._collector = None
+
+    def _spawn(self, index):
+        results, writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._jobs, writer, self._current, self.torch_threads, self.pipeline_kwargs),
+            daemon=True,
+        )
+        process.start()
+        # Only the worker holds the write end, so reads see EOF once it exits
+        writer.close()
+        self._workers[index] = process
+        self._results[index] = results
+
+    def start(self):
+        """Start the worker processes and the result collector."""
+        for index in range(self.num_workers):
+            self._spawn(index)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        return self
+
+    def submit(self, image):
+        """
+        Queue one image for inference.
+
+        Args:
+            image (str | bytes): Image path or encoded image bytes.
+
+        Returns:
+            Future: Resolves to the detection result dict.
+        """
+        if self._closed:
+            raise RuntimeError("Inference pool is shut down")
+        job_id = next(self._ids)
+        future = Future()
+        with self._lock:
+            if self._broken is not None:
+                future.set_exception(PoolBrokenException(self._broken))
+                return future
+            self._pending[job_id] = [future, image, 0]
+        self._jobs.put((job_id, image))
+        return future
+
+    def map(self, images, timeout=INFERENCE_JOB_TIMEOUT):
+        """Run many images through the pool and return their results in input order."""
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect(self):
+        while not self._closed or self._pending:
+            # Wake up for a result, as soon as a worker exits, or when a respawn is due
+            timeout = 1.0
+            if self._respawn_at:
+                timeout = min(timeout, max(0.0, min(self._respawn_at.values()) - time.monotonic()))
+            sentinels = [process.sentinel for process in self._workers.values()]
+            ready = wait(list(self._results.values()) + sentinels, timeout=timeout)
+            for index, results in list(self._results.items()):
+                if results in ready:
+                    self._receive(index, results)
+            self._restart_crashed()
+
+    def _receive(self, index, results):
+        try:
+            kind, index, job_id, payload = results.recv()
+        except (EOFError, OSError):
+            # The worker exited; _restart_crashed handles it
+            return False
+        if kind == "ready":
+            self._ready.add(index)
+            self._startup_failures[index] = 0
+            return True
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+        if entry is not None:
+            if kind == "done":
+                entry[0].set_result(payload)
+            else:
+                entry[0].set_exception(RuntimeError(payload))
+        return True
+
+    def _restart_crashed(self):
+        if self._closed:
+            return
+        for index, process in list(self._workers.items()):
+            if process.is_alive():
+                continue
+
+            print(f"Inference worker {index} exited with code {process.exitcode}")
+            # Deliver whatever the worker sent before it died, then retire its pipe;
+            # a message cut off mid-write ends in EOFError
+            results = self._results.pop(index)
+            try:
+                while results.poll() and self._receive(index, results):
+                    pass
+            except Exception:
+                pass
+            results.close()
+            del self._workers[index]
+
+            with self._lock:
+                job_id = self._current[index]
+                self._current[index] = -1
+                entry = self._pending.get(job_id) if job_id >= 0 else None
+                # Retry the job the worker died on, unless it already killed MAX_JOB_ATTEMPTS workers
+                if entry is not None:
+                    entry[2] += 1
+                    if entry[2] >= MAX_JOB_ATTEMPTS:
+                        self._pending.pop(job_id)
+                        entry[0].set_exception(WorkerCrashedException(f"Worker crashed while running job {job_id}"))
+                        entry = None
+            if entry is not None:
+                self._jobs.put((job_id, entry[1]))
+
+            if index in self._ready:
+                self._ready.discard(index)
+                self._respawn_at[index] = time.monotonic()
+                continue
+            # Died before loading its models, e.g. a failed import or model download
+            self._startup_failures[index] += 1
+            failures = self._startup_failures[index]
+            if failures >= MAX_STARTUP_FAILURES:
+                self._break(f"Inference worker {index} failed to start {failures} times in a row "
+                            f"(last exit code {process.exitcode})")
+                return
+            self._respawn_at[index] = time.monotonic() + min(STARTUP_BACKOFF_MAX, STARTUP_BACKOFF * 2 ** (failures - 1))
+
+        now = time.monotonic()
+        for index, respawn_at in list(self._respawn_at.items()):
+            if respawn_at <= now and self._broken is None:
+                del self._respawn_at[index]
+                print(f"Restarting inference worker {index}")
+                self._spawn(index)
+
+    def _break(self, reason):
+        # Fail everything now instead of letting callers wait out their timeouts
+        print(f"{reason}, failing all inference jobs")
+        self._respawn_at.clear()
+        with self._lock:
+            self._broken = reason
+            entries = list(self._pending.values())
+            self._pending.clear()
+        for future, _, _ in entries:
+            future.set_exception(PoolBrokenException(reason))
+
+    def shutdown(self, wait=True, timeout=INFERENCE_JOB_TIMEOUT):
+        """Stop accepting jobs, let queued jobs finish (for up to timeout seconds), and stop the workers."""
+        if self._closed:
+            return
+        if wait:
+            deadline = time.monotonic() + timeout
+            for future in [entry[0] for entry in list(self._pending.values())]:
+                try:
+                    future.result(timeout=max(0, deadline - time.monotonic()))
+                except Exception:
+                    pass
+        self._closed = True
+        workers = list(self._workers.values())
+        for _ in workers:
+            self._jobs.put(None)
+        for process in workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            for future, _, _ in self._pending.values():
+                future.set_exception(RuntimeError("Inference pool shut down"))
+            self._pending.clear()
+        # The collector exits once nothing is pending; only then is it safe to close the pipes it waits on
+        if self._collector is not None:
+            self._collector.join(timeout=5)
+        for results in self._results.values():
+            results.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+# Process-wide pool, created on first use
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Return the shared inference pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool().start()
+            atexit.register(shutdown_pool)
+        return _pool
+
+def shutdown_pool():
+    """Shut down the shared inference pool if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,23 @@
+import queue
+
+import pytest
+from google.auth.credentials import AnonymousCredentials
+
+from src.flask_app import drive_index, drive_utils
+from tests.fake_drive import FakeDrive
+
+
+@pytest.fixture
+def fake_drive(monkeypatch, tmp_path):
+    """Point drive_utils at a fresh FakeDrive server and an empty local index."""
+    drive = FakeDrive().start()
+    monkeypatch.setattr(drive_utils, "DRIVE_API_ENDPOINT", drive.url)
+    monkeypatch.setattr(drive_utils, "_credentials", AnonymousCredentials())
+    monkeypatch.setattr(drive_utils, "_drive_service", None)
+    monkeypatch.setattr(drive_utils, "_service_pool", queue.LifoQueue())
+    monkeypatch.setattr(drive_utils, "_listing_cache", drive_utils.TTLCache(max_items=16, ttl=60))
+    monkeypatch.setattr(drive_utils, "_metadata_cache", drive_utils.TTLCache(max_items=16, ttl=60))
+    monkeypatch.setattr(drive_index, "DRIVE_INDEX_PATH", str(tmp_path / "drive_index.sqlite3"))
+    monkeypatch.setattr(drive_index, "_connection", None)
+    yield drive
+    drive.stop()
@@ -0,0 +1,201 @@
+import email
+import itertools
+import json
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeDrive:
+    """In-process HTTP server speaking the parts of the Drive v3 API that drive_utils uses."""
+
+    def __init__(self, latency=0.0, honor_range=True):
+        """
+        Args:
+            latency (float): Seconds every request waits before it is answered.
+            honor_range (bool): Answer Range requests with 206; otherwise send the whole file.
+        """
+        self.latency = latency
+        self.honor_range = honor_range
+        self.files = {}
+        self.requests = []
+        # (method, path, query) of every call made inside a /batch request
+        self.batched = []
+        # Client (host, port) of every TCP connection that sent a request
+        self.connections = set()
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_file(self, data, name="file.bin", folder_id="folder"):
+        """Store a file directly and return its id."""
+        with self._lock:
+            file_id = f"file{next(self._ids)}"
+            self.files[file_id] = {"name": name, "parents": [folder_id], "data": bytes(data)}
+        return file_id
+
+    def count(self, method, path_pattern, **params):
+        """Number of requests received so far matching a method, a path regex and query parameters."""
+        with self._lock:
+            return sum(
+                1 for m, path, query, _ in self.requests
+                if m == method and re.fullmatch(path_pattern, path)
+                and all(query.get(key) == value for key, value in params.items())
+            )
+
+    def _metadata(self, file_id):
+        entry = self.files[file_id]
+        return {
+            "id": file_id,
+            "name": entry["name"],
+            "parents": entry["parents"],
+            "size": str(len(entry["data"])),
+            "mimeType": "application/octet-stream",
+            "webViewLink": f"https://drive.example/{file_id}",
+        }
+
+    def _list(self, query):
+        # Only the "'<folder>' in parents and trashed=false" queries drive_utils sends
+        match = re.search(r"'((?:[^'\\]|\\.)*)' in parents", query.get("q", ""))
+        if match is None:
+            return 400, {"error": {"code": 400, "message": "Unsupported query"}}
+        folder_id = re.sub(r"\\(.)", r"\1", match.group(1))
+        with self._lock:
+            ids = [file_id for file_id, entry in self.files.items() if folder_id in entry["parents"]]
+        # Page tokens are offsets into the folder's files
+        start = int(query.get("pageToken") or 0)
+        end = start + int(query.get("pageSize", 100))
+        body = {"files": [{"id": file_id, "name": self.files[file_id]["name"]} for file_id in ids[start:end]]}
+        if end < len(ids):
+            body["nextPageToken"] = str(end)
+        return 200, body
+
+    def _get(self, path, query):
+        if path == "/drive/v3/files":
+            return self._list(query)
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+        if match is None or match.group(1) not in self.files:
+            return 404, {"error": {"code": 404, "message": "File not found"}}
+        return 200, self._metadata(match.group(1))
+
+    def _batch(self, content_type, body):
+        """Answer a multipart/mixed batch of GET calls with a multipart/mixed reply."""
+        request = email.message_from_bytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "fake_drive_batch"
+        parts = []
+        for part in request.get_payload():
+            call = part.get_payload()
+            method, target = call.split("\n", 1)[0].split(" ")[:2]
+            url = urlparse(target)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            with self._lock:
+                self.batched.append((method, url.path, query))
+            status, reply = self._get(url.path, query) if method == "GET" else (405, {"error": {"code": 405}})
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n\r\n{json.dumps(reply)}\r\n"
+            )
+        return "".join(parts) + f"--{boundary}--\r\n", f"multipart/mixed; boundary={boundary}"
+
+    def _handler(self):
+        drive = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body=b"", headers=None):
+                if isinstance(body, dict):
+                    body = json.dumps(body).encode()
+                    headers = {"Content-Type": "application/json", **(headers or {})}
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _begin(self):
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with drive._lock:
+                    drive.requests.append((self.command, url.path, query, dict(self.headers)))
+                    drive.connections.add(self.client_address)
+                if drive.latency:
+                    time.sleep(drive.latency)
+                return url.path, query, body
+
+            def do_POST(self):
+                path, query, body = self._begin()
+                if path == "/upload/drive/v3/files" and query.get("uploadType") == "resumable":
+                    with drive._lock:
+                        session = str(next(drive._ids))
+                        drive._sessions[session] = {"metadata": json.loads(body or b"{}"), "data": bytearray()}
+                    location = f"{drive.url}upload/drive/v3/files?uploadType=resumable&upload_id={session}"
+                    return self._reply(200, headers={"Location": location})
+                if path == "/batch/drive/v3":
+                    reply, content_type = drive._batch(self.headers["Content-Type"], body)
+                    return self._reply(200, reply.encode(), {"Content-Type": content_type})
+                self._reply(404, {"error": {"code": 404, "message": f"No route for POST {path}"}})
+
+            def do_PUT(self):
+                path, query, body = self._begin()
+                session = drive._sessions.get(query.get("upload_id"))
+                if path != "/upload/drive/v3/files" or session is None:
+                    return self._reply(404, {"error": {"code": 404, "message": "Unknown upload session"}})
+
+                # "bytes start-end/total", "bytes start-end/*" or "bytes */total"
+                match = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", self.headers.get("Content-Range", ""))
+                if match is None:
+                    total = len(body)
+                    session["data"][:] = body
+                else:
+                    if match.group(1) is not None:
+                        start = int(match.group(1))
+                        session["data"][start:start + len(body)] = body
+                    total = None if match.group(3) == "*" else int(match.group(3))
+
+                if total is None or len(session["data"]) < total:
+                    headers = {"Range": f"bytes=0-{len(session['data']) - 1}"} if session["data"] else {}
+                    return self._reply(308, headers=headers)
+
+                metadata = session["metadata"]
+                file_id = drive.add_file(session["data"], metadata.get("name"), (metadata.get("parents") or [None])[0])
+                self._reply(200, {"id": file_id, "webViewLink": f"https://drive.example/{file_id}"})
+
+            def do_GET(self):
+                path, query, _ = self._begin()
+                if query.get("alt") != "media":
+                    return self._reply(*drive._get(path, query))
+                match = re.fullmatch(r"/drive/v3/files/([^/]+)", path)
+                if match is None or match.group(1) not in drive.files:
+                    return self._reply(404, {"error": {"code": 404, "message": "File not found"}})
+
+                data = drive.files[match.group(1)]["data"]
+                byte_range = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+                if byte_range is None or not drive.honor_range:
+                    return self._reply(200, data)
+                start = int(byte_range.group(1))
+                end = min(int(byte_range.group(2) or len(data) - 1), len(data) - 1)
+                self._reply(206, data[start:end + 1], {"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+
+        return Handler
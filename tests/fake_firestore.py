@@ -0,0 +1,82 @@
+import threading
+import time
+
+from google.api_core.exceptions import NotFound
+
+
+class FakeDocumentReference:
+    def __init__(self, path):
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+
+class FakeCollectionReference:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, document_id):
+        return FakeDocumentReference(f"{self.name}/{document_id}")
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._check(data)
+        self._writes.append(("set", ref, dict(data), merge))
+
+    def update(self, ref, data):
+        self._check(data)
+        self._writes.append(("update", ref, dict(data), None))
+
+    @staticmethod
+    def _check(data):
+        # Like the real client, reject obviously invalid writes when they are added
+        if not isinstance(data, dict) or not data:
+            raise ValueError("Cannot write an empty or non-dict document")
+
+    def commit(self):
+        self._db.commit(self._writes)
+
+
+class FakeFirestore:
+    """In-memory stand-in for the Firestore client as used by FirestoreWriteBuffer."""
+
+    def __init__(self, commit_delays=()):
+        """
+        Args:
+            commit_delays (iterable): Seconds each successive commit takes; later commits are instant.
+        """
+        self.documents = {}
+        self.commits = []
+        self._delays = list(commit_delays)
+        self._lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeCollectionReference(name)
+
+    def document(self, path):
+        return FakeDocumentReference(path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def commit(self, writes):
+        with self._lock:
+            delay = self._delays.pop(0) if self._delays else 0
+        time.sleep(delay)
+        with self._lock:
+            # All-or-nothing, like a real batch commit
+            exists = set(self.documents)
+            for kind, ref, _, _ in writes:
+                if kind == "update" and ref.path not in exists:
+                    raise NotFound(f"No document to update: {ref.path}")
+                exists.add(ref.path)
+            for kind, ref, data, merge in writes:
+                if kind == "set" and not merge:
+                    self.documents[ref.path] = dict(data)
+                else:
+                    self.documents.setdefault(ref.path, {}).update(data)
+            self.commits.append([(kind, ref.path) for kind, ref, _, _ in writes])
@@ -0,0 +1,50 @@
+from src.ml_module import main
+from src.ml_module.manifest import Manifest
+
+
+def test_partial_items_retry_only_the_failed_crops(tmp_path, monkeypatch):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"jpeg")
+    manifest_path = str(tmp_path / "manifest.jsonl")
+    calls = []
+
+    def service_model(name, is_full_image, image_bytes, uploaded):
+        calls.append(dict(uploaded))
+        results = [uploaded.get("photo_top_0.jpg") or {"file_name": "photo_top_0.jpg", "fileId": "top"}]
+        if len(calls) == 1:
+            # Drive is down for the second crop
+            return {"message": "", "results": results, "failed": ["photo_pants_0.jpg"]}
+        results.append({"file_name": "photo_pants_0.jpg", "fileId": "pants"})
+        return {"message": "", "results": results, "failed": []}
+
+    monkeypatch.setattr(main, "service_model", service_model)
+
+    report = main.process_batch([str(photo)], manifest_path)
+    assert (report["processed"], report["failed"]) == (0, 1)
+    assert Manifest(manifest_path).get(str(photo))["status"] == "partial"
+
+    report = main.process_batch([str(photo)], manifest_path)
+    assert (report["processed"], report["failed"]) == (1, 0)
+    assert list(calls[1]) == ["photo_top_0.jpg"]
+    entry = Manifest(manifest_path).get(str(photo))
+    assert entry["status"] == "done"
+    assert [item["fileId"] for item in entry["results"]] == ["top", "pants"]
+
+    report = main.process_batch([str(photo)], manifest_path)
+    assert report["skipped"] == 1
+    assert len(calls) == 2
+
+
+def test_resumed_drive_batch_skips_done_items_without_drive_calls(tmp_path, monkeypatch):
+    manifest = Manifest(str(tmp_path / "manifest.jsonl"))
+    for i in range(3):
+        manifest.record(f"drive:file{i}", "done", name=f"{i}.jpg", results=[])
+    metadata_calls = []
+    monkeypatch.setattr(main, "get_file_metadata", lambda file_id: metadata_calls.append(file_id) or {"name": "x.jpg"})
+    monkeypatch.setattr(main, "download_bytes", lambda file_id, size=None: b"jpeg")
+    monkeypatch.setattr(main, "service_model", lambda *args: {"message": "", "results": [], "failed": []})
+
+    report = main.process_batch([f"file{i}" for i in range(4)], manifest.path, from_drive=True)
+
+    assert report["skipped"] == 3
+    assert metadata_calls == ["file3"]
@@ -0,0 +1,78 @@
+import os
+from types import SimpleNamespace
+
+from src.ml_module.cache import DetectionCache
+
+
+def _pipe(**overrides):
+    settings = dict(
+        human_model="human", clothing_model="clothing", backend="torch", human_threshold=0.9,
+        crop_to_human=False, crop_padding=0.1, crop_size=None,
+    )
+    return SimpleNamespace(**{**settings, **overrides})
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = DetectionCache(max_items=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+    assert cache.stats() == {"hits": 3, "disk_hits": 0, "misses": 1, "hit_rate": 0.75, "memory_items": 2}
+
+
+def test_results_are_copied_in_and_out():
+    cache = DetectionCache()
+    value = {"people": []}
+    cache.put("a", value)
+    value["people"].append("changed")
+    cache.get("a")["people"].append("changed")
+
+    assert cache.get("a") == {"people": []}
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    DetectionCache(cache_dir=str(tmp_path)).put("a", {"n": 1})
+
+    cache = DetectionCache(cache_dir=str(tmp_path))
+
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("a") == {"n": 1}
+    assert (cache.disk_hits, cache.hits, cache.misses) == (1, 1, 0)
+
+
+def test_disk_tier_evicts_least_recently_used_files(tmp_path):
+    cache = DetectionCache(cache_dir=str(tmp_path))
+    for age, key in enumerate(["new", "old"]):
+        cache.put(key, {"data": "x" * 1000})
+        # Older modification time means less recently used
+        os.utime(cache._disk_path(key), (1000 - age * 100, 1000 - age * 100))
+    size = os.path.getsize(cache._disk_path("new"))
+
+    cache.max_disk_bytes = size + size // 2
+    cache._evict_disk()
+
+    assert os.path.exists(cache._disk_path("new"))
+    assert not os.path.exists(cache._disk_path("old"))
+
+
+def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = DetectionCache(cache_dir=str(tmp_path))
+    with open(cache._disk_path("a"), "wb") as f:
+        f.write(b"not a pickle")
+
+    assert cache.get("a") is None
+    assert cache.misses == 1
+
+
+def test_key_depends_on_content_and_settings():
+    key = DetectionCache.make_key(b"image", _pipe())
+
+    assert DetectionCache.make_key(b"image", _pipe()) == key
+    assert DetectionCache.make_key(b"other", _pipe()) != key
+    assert DetectionCache.make_key(b"image", _pipe(crop_to_human=True)) != key
+    assert DetectionCache.make_key(b"image", _pipe(), threshold=0.5) != key
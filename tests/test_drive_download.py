@@ -0,0 +1,62 @@
+import os
+import time
+
+from src.flask_app import drive_utils
+
+
+def test_download_bytes_uses_cached_metadata(fake_drive):
+    data = os.urandom(5000)
+    file_id = fake_drive.add_file(data)
+
+    assert drive_utils.get_file_metadata(file_id)["size"] == "5000"
+    assert drive_utils.download_bytes(file_id) == data
+    assert drive_utils.download_bytes(file_id) == data
+
+    # The size comes from the metadata cache rather than a request per download
+    assert fake_drive.count("GET", f"/drive/v3/files/{file_id}", alt="json") == 1
+    assert fake_drive.count("GET", f"/drive/v3/files/{file_id}", alt="media") == 2
+
+
+def test_large_download_uses_ranges(fake_drive, monkeypatch):
+    monkeypatch.setattr(drive_utils, "RANGE_DOWNLOAD_THRESHOLD", 1024 * 1024)
+    data = os.urandom(10 * 1024 * 1024)
+    file_id = fake_drive.add_file(data)
+    progress = []
+
+    assert drive_utils.download_bytes(file_id, progress=lambda *args: progress.append(args)) == data
+    assert fake_drive.count("GET", f"/drive/v3/files/{file_id}", alt="media") == 3
+    assert max(done for _, done, _ in progress) == len(data)
+
+
+def test_large_download_falls_back_when_range_is_ignored(fake_drive, monkeypatch):
+    monkeypatch.setattr(drive_utils, "RANGE_DOWNLOAD_THRESHOLD", 1024 * 1024)
+    fake_drive.honor_range = False
+    data = os.urandom(6 * 1024 * 1024)
+    file_id = fake_drive.add_file(data)
+
+    assert drive_utils.download_bytes(file_id) == data
+
+
+def test_missing_file_is_reported(fake_drive):
+    results = drive_utils.download_files(["missing"])
+
+    assert results[0]["file_id"] == "missing"
+    assert "error" in results[0]
+
+
+def test_parallel_downloads_are_faster(fake_drive):
+    fake_drive.latency = 0.05
+    files = {fake_drive.add_file(os.urandom(4096)): None for _ in range(16)}
+    file_ids = list(files)
+
+    start = time.perf_counter()
+    sequential = drive_utils.download_files(file_ids[:8], max_workers=1)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = drive_utils.download_files(file_ids[8:], max_workers=8)
+    parallel_time = time.perf_counter() - start
+
+    for result in sequential + parallel:
+        assert result["data"] == fake_drive.files[result["file_id"]]["data"]
+    assert parallel_time * 3 < sequential_time
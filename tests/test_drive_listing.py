@@ -0,0 +1,51 @@
+from src.flask_app import drive_utils
+
+
+def _fill(fake_drive, count, folder_id="folder"):
+    return [fake_drive.add_file(b"x", f"{i}.jpg", folder_id) for i in range(count)]
+
+
+def test_iter_files_follows_every_page(fake_drive):
+    ids = _fill(fake_drive, 250)
+    fake_drive.add_file(b"x", "elsewhere.jpg", "other")
+
+    files = list(drive_utils.iter_files_in_folder("folder", page_size=100))
+
+    assert [f["id"] for f in files] == ids
+    assert fake_drive.count("GET", "/drive/v3/files") == 3
+
+
+def test_list_files_page_is_cached_per_page(fake_drive):
+    ids = _fill(fake_drive, 150)
+
+    first, token = drive_utils.list_files_page("folder", page_size=100)
+    assert drive_utils.list_files_page("folder", page_size=100) == (first, token)
+    second, last_token = drive_utils.list_files_page("folder", page_size=100, page_token=token)
+
+    assert [f["id"] for f in first + second] == ids
+    assert last_token is None
+    assert fake_drive.count("GET", "/drive/v3/files") == 2
+
+
+def test_upload_invalidates_the_folder_listing(fake_drive):
+    _fill(fake_drive, 3)
+    _fill(fake_drive, 1, "other")
+
+    assert len(drive_utils.list_files_in_folder("folder")) == 3
+    assert len(drive_utils.list_files_in_folder("other")) == 1
+    assert len(drive_utils.list_files_in_folder("folder")) == 3
+    assert fake_drive.count("GET", "/drive/v3/files") == 2
+
+    drive_utils.upload_bytes("new.jpg", b"\xff\xd8\xff\xe0new", "folder")
+
+    names = [f["name"] for f in drive_utils.list_files_in_folder("folder")]
+    assert names == ["0.jpg", "1.jpg", "2.jpg", "new.jpg"]
+    # The other folder's listing is still cached
+    drive_utils.list_files_in_folder("other")
+    assert fake_drive.count("GET", "/drive/v3/files") == 3
+
+
+def test_folder_ids_are_escaped_in_the_query(fake_drive):
+    fake_drive.add_file(b"x", "quoted.jpg", "it's")
+
+    assert [f["name"] for f in drive_utils.list_files_in_folder("it's")] == ["quoted.jpg"]
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from src.flask_app import drive_utils
+
+
+def test_metadata_misses_are_fetched_in_batches(fake_drive, monkeypatch):
+    monkeypatch.setattr(drive_utils, "_metadata_cache", drive_utils.TTLCache(max_items=1000, ttl=60))
+    ids = [fake_drive.add_file(b"x" * i, f"{i}.jpg") for i in range(1, 151)]
+
+    results = drive_utils.get_files_metadata(ids + ["missing", ids[0]])
+
+    assert list(results) == ids + ["missing"]
+    assert results[ids[41]]["name"] == "42.jpg"
+    assert results[ids[41]]["size"] == "42"
+    assert results["missing"] is None
+    # 151 distinct ids at 100 calls per batch request
+    assert fake_drive.count("POST", "/batch/drive/v3") == 2
+    assert len(fake_drive.batched) == 151
+
+    # Found files are cached; the missing one is asked for again
+    assert drive_utils.get_files_metadata(ids[:10] + ["missing"])[ids[0]]["id"] == ids[0]
+    assert fake_drive.count("POST", "/batch/drive/v3") == 3
+    assert len(fake_drive.batched) == 152
+    assert drive_utils.get_file_metadata(ids[5])["name"] == "6.jpg"
+    assert fake_drive.count("GET", r"/drive/v3/files/.+") == 0
+
+
+def test_concurrent_misses_share_one_fetch(fake_drive):
+    fake_drive.latency = 0.5
+    file_id = fake_drive.add_file(b"data", "photo.jpg")
+    results = {}
+
+    batch = threading.Thread(target=lambda: results.update(batch=drive_utils.get_files_metadata([file_id])))
+    batch.start()
+    time.sleep(0.2)
+    # Asked for while the batch is in flight
+    single = drive_utils.get_file_metadata(file_id)
+    batch.join()
+
+    assert single == results["batch"][file_id]
+    assert single["name"] == "photo.jpg"
+    assert len(fake_drive.batched) == 1
+    assert fake_drive.count("GET", rf"/drive/v3/files/{file_id}") == 0
+
+
+def test_requests_from_new_threads_reuse_one_connection(fake_drive):
+    ids = [fake_drive.add_file(b"x", f"{i}.jpg") for i in range(5)]
+
+    # Like Flask's dev server, which starts a thread per request
+    for file_id in ids:
+        thread = threading.Thread(target=drive_utils.get_file_metadata, args=(file_id,))
+        thread.start()
+        thread.join()
+    drive_utils.list_files_in_folder("folder")
+
+    assert fake_drive.count("GET", r"/drive/v3/files.*") == 6
+    assert len(fake_drive.connections) == 1
+    assert drive_utils._service_pool.qsize() == 1
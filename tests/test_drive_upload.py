@@ -0,0 +1,90 @@
+import io
+import os
+import time
+
+from src.flask_app import drive_index, drive_utils
+
+
+class _Stream(io.RawIOBase):
+    """Non-seekable stream, like a request body."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+
+def test_upload_bytes_round_trip(fake_drive):
+    data = b"\xff\xd8\xff" + os.urandom(1000)
+
+    uploaded = drive_utils.upload_bytes("photo.jpg", data, "folder")
+
+    stored = fake_drive.files[uploaded["id"]]
+    assert stored["data"] == data
+    assert stored["name"] == "photo.jpg"
+    assert stored["parents"] == ["folder"]
+    assert drive_index.find_by_name("photo.jpg", "folder")["file_id"] == uploaded["id"]
+
+
+def test_upload_stream_sends_chunks(fake_drive):
+    data = os.urandom(600 * 1024)
+
+    uploaded = drive_utils.upload_stream("big.bin", _Stream(data), "folder", chunk_size=256 * 1024)
+
+    assert fake_drive.files[uploaded["id"]]["data"] == data
+    assert fake_drive.count("PUT", "/upload/drive/v3/files") == 3
+    # The hash is computed while streaming, so a second copy is recognised
+    assert drive_utils.find_duplicate(drive_utils._content_hash(data), "folder")["file_id"] == uploaded["id"]
+
+
+def test_duplicate_upload_is_skipped(fake_drive):
+    data = os.urandom(2048)
+
+    first = drive_utils.upload_bytes("a.bin", data, "folder")
+    second = drive_utils.upload_bytes("b.bin", data, "folder")
+
+    assert second == {"id": first["id"], "webViewLink": first["webViewLink"], "duplicate": True}
+    assert len(fake_drive.files) == 1
+
+
+def test_parallel_uploads_are_faster(fake_drive, tmp_path):
+    fake_drive.latency = 0.05
+    uploads = []
+    for i in range(16):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(os.urandom(4096))
+        uploads.append({"file_name": path.name, "file_path": str(path), "folder_id": f"folder{i % 2}"})
+
+    start = time.perf_counter()
+    sequential = drive_utils.upload_files(uploads[:8], max_workers=1)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = drive_utils.upload_files(uploads[8:], max_workers=8)
+    parallel_time = time.perf_counter() - start
+
+    assert all("file_id" in result for result in sequential + parallel)
+    assert len(fake_drive.files) == 16
+    assert parallel_time * 3 < sequential_time
+
+
+def test_upload_batches_reuse_pooled_connections(fake_drive, tmp_path):
+    def batch(prefix):
+        uploads = []
+        for i in range(8):
+            path = tmp_path / f"{prefix}{i}.bin"
+            path.write_bytes(os.urandom(4096))
+            uploads.append({"file_name": path.name, "file_path": str(path), "folder_id": "folder"})
+        return drive_utils.upload_files(uploads, max_workers=4)
+
+    batch("a")
+    opened = len(fake_drive.connections)
+    batch("b")
+
+    # The second call's new worker threads check out the first call's clients
+    assert opened <= 4
+    assert len(fake_drive.connections) == opened
@@ -0,0 +1,45 @@
+import pytest
+from google.api_core.exceptions import NotFound
+
+from src.flask_app import firestore_utils
+from src.flask_app.write_buffer import FirestoreWriteBuffer
+from tests.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeFirestore()
+    buffer = FirestoreWriteBuffer(db, flush_interval=60)
+    monkeypatch.setattr(firestore_utils, "_db", db)
+    monkeypatch.setattr(firestore_utils, "_write_buffer", buffer)
+    monkeypatch.setattr(firestore_utils, "_parsed_cache", firestore_utils.TTLCache(max_items=16, ttl=60))
+    yield db
+    buffer.close()
+
+
+def test_parsed_status_is_cached_after_commit(db):
+    db.documents["Images/a"] = {"beenParsed": False}
+
+    future = firestore_utils.mark_image_parsed("a")
+    assert firestore_utils._parsed_cache.get("a") is None
+
+    firestore_utils.get_write_buffer().flush()
+    assert future.result(timeout=1) is True
+    assert firestore_utils._parsed_cache.get("a") is True
+
+
+def test_failed_parsed_write_is_not_cached(db):
+    future = firestore_utils.mark_image_parsed("missing")
+    firestore_utils.get_write_buffer().flush()
+
+    with pytest.raises(NotFound):
+        future.result(timeout=1)
+    assert firestore_utils._parsed_cache.get("missing") is None
+
+
+def test_missing_image_fails_clothing_items_future(db):
+    future = firestore_utils.save_clothing_items("missing", [{"fileId": "x"}])
+    firestore_utils.get_write_buffer().flush()
+
+    with pytest.raises(NotFound):
+        future.result(timeout=1)
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from src.flask_app import app
+from src.ml_module import ingest
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def _wait_for_job(client, job_id):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        body = client.get(f"/jobs/{job_id}?files=1").get_json()
+        if body["status"] in ("done", "failed"):
+            return body
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_files_with_the_same_name_are_tracked_separately(client, monkeypatch):
+    def run_ingest(files):
+        results = [dict(f) for f in files]
+        results[0].update(image_id="img1", clothing_items=["a"])
+        results[1]["error"] = "detect: no human"
+        return results, {"elapsed_seconds": 0, "stages": {}}
+
+    monkeypatch.setattr(ingest, "run_ingest", run_ingest)
+    response = client.post("/ai/ingest", json={"files": [
+        {"file_id": "id1", "name": "image.jpg"},
+        {"file_id": "id2", "name": "image.jpg"},
+    ]})
+    assert response.status_code == 202
+
+    job = _wait_for_job(client, response.get_json()["job_id"])
+
+    assert (job["total"], job["completed"], job["failed"]) == (2, 1, 1)
+    assert [(f["file_id"], f["file_name"], f["status"]) for f in job["files"]] == [
+        ("id1", "image.jpg", "done"), ("id2", "image.jpg", "failed")
+    ]
+
+
+@pytest.mark.parametrize("files", [["id1"], [7], [{"file_id": "id1"}], []])
+def test_malformed_files_are_rejected(client, files):
+    response = client.post("/ai/ingest", json={"files": files})
+
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import threading
+import time
+
+from src.flask_app import jobs
+from src.flask_app.jobs import Job, JobStore
+
+
+def _wait(job):
+    deadline = time.monotonic() + 5
+    while job.finished_at is None:
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+def test_job_reports_per_file_progress():
+    store = JobStore()
+
+    def handler(job):
+        job.update_file("a.jpg", "done", result={"id": 1})
+        job.update_file("b.jpg", "failed", error="boom")
+
+    job = store.submit("upload", ["a.jpg", "b.jpg", "c.jpg"], handler)
+    _wait(job)
+
+    data = store.get(job.id).to_dict(include_files=True)
+    assert (data["status"], data["total"], data["completed"], data["failed"]) == ("done", 3, 1, 1)
+    assert [entry["status"] for entry in data["files"]] == ["done", "failed", "pending"]
+    assert "files" not in job.to_dict()
+
+
+def test_job_whose_files_all_failed_or_that_raised_is_failed():
+    store = JobStore()
+    failed = store.submit("upload", ["a.jpg"], lambda job: job.update_file("a.jpg", "failed", error="boom"))
+
+    def crash(job):
+        raise RuntimeError("no Drive")
+
+    crashed = store.submit("upload", ["a.jpg"], crash)
+    _wait(failed)
+    _wait(crashed)
+
+    assert failed.status == "failed"
+    assert (crashed.status, crashed.error) == ("failed", "no Drive")
+
+
+def test_file_reported_twice_is_counted_once():
+    job = Job("ingest", ["image.jpg", "image.jpg"], file_ids=["id1", "id2"])
+    job.update_file("id1", "failed", error="boom")
+    job.update_file("id1", "done")
+
+    assert (job.total, job.completed, job.failed) == (2, 1, 0)
+
+
+def test_finished_jobs_are_pruned_by_count():
+    store = JobStore(max_finished=2)
+    finished = [store.submit("upload", [], lambda job: None) for _ in range(3)]
+    for job in finished:
+        _wait(job)
+    # Pruning runs as each job finishes
+    time.sleep(0.05)
+
+    assert store.get(finished[0].id) is None
+    assert all(store.get(job.id) is job for job in finished[1:])
+
+
+def test_finished_jobs_are_pruned_after_their_ttl(monkeypatch):
+    store = JobStore(ttl=60)
+    done = store.submit("upload", [], lambda job: None)
+    _wait(done)
+    release = threading.Event()
+    running = store.submit("upload", [], lambda job: release.wait(5))
+    time.sleep(0.05)
+
+    now = time.time()
+    monkeypatch.setattr(jobs.time, "time", lambda: now + 61)
+    store.submit("upload", [], lambda job: None)
+
+    assert store.get(done.id) is None
+    # Jobs that have not finished are never pruned
+    assert store.get(running.id) is running
+    release.set()
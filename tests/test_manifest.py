@@ -0,0 +1,42 @@
+from src.ml_module.manifest import Manifest
+
+
+def test_recorded_items_survive_a_restart(tmp_path):
+    path = str(tmp_path / "run" / "manifest.jsonl")
+    manifest = Manifest(path)
+    manifest.record("a", "done", results=[1])
+    manifest.record("b", "failed", error="boom")
+    manifest.record("c", "partial", failed=["c_0.jpg"])
+
+    resumed = Manifest(path)
+
+    assert resumed.is_done("a")
+    assert not resumed.is_done("b")
+    assert not resumed.is_done("c")
+    assert not resumed.is_done("missing")
+    assert resumed.get("a")["results"] == [1]
+    assert resumed.get("c")["failed"] == ["c_0.jpg"]
+
+
+def test_latest_record_of_a_key_wins(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    manifest = Manifest(path)
+    manifest.record("a", "failed", error="boom")
+    manifest.record("a", "done")
+
+    assert Manifest(path).is_done("a")
+
+
+def test_partial_last_line_is_ignored(tmp_path):
+    path = tmp_path / "manifest.jsonl"
+    Manifest(str(path)).record("a", "done")
+    # A run killed mid-write
+    with open(path, "a") as f:
+        f.write('{"key": "b", "stat')
+
+    manifest = Manifest(str(path))
+
+    assert manifest.is_done("a")
+    assert manifest.get("b") is None
+    manifest.record("b", "done")
+    assert Manifest(str(path)).is_done("b")
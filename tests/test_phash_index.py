@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+
+from src.ml_module.phash_index import PerceptualHashIndex, colors_match, dhash, is_informative, mean_color
+
+
+def test_flat_crops_are_not_informative():
+    white = np.full((64, 48, 3), 255, dtype=np.uint8)
+    navy = np.zeros((64, 48, 3), dtype=np.uint8)
+    navy[:] = (80, 0, 0)
+
+    # Every plain crop hashes to 0, whatever its colour
+    assert dhash(white) == dhash(navy) == 0
+    assert not is_informative(dhash(white))
+    assert not colors_match(mean_color(white), mean_color(navy))
+
+    textured = np.random.default_rng(0).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+    assert is_informative(dhash(textured))
+
+
+def test_claim_rejects_matches_the_caller_does_not_accept():
+    index = PerceptualHashIndex()
+    index.add(0x0F0F0F0F0F0F0F0F, {"fileId": "red", "meanColor": [200, 20, 20]})
+
+    accept_blue = lambda data: colors_match(data["meanColor"], [20, 20, 200])
+    assert index.claim(0x0F0F0F0F0F0F0F0F, {"meanColor": [20, 20, 200]}, accept_blue) is None
+
+    distance, future = index.claim(0x0F0F0F0F0F0F0F0E, {}, lambda data: data["fileId"] == "red")
+    assert distance == 1
+    assert future.result(timeout=1)["fileId"] == "red"
+
+
+def test_concurrent_claims_upload_once():
+    index = PerceptualHashIndex()
+    value = 0x00FF00FF00FF00FF
+    barrier = threading.Barrier(8)
+    uploads = []
+    results = []
+
+    def upload(n):
+        barrier.wait()
+        claimed = index.claim(value ^ (n & 1), {})
+        if claimed is None:
+            uploads.append(n)
+            index.complete(value ^ (n & 1), {"fileId": f"file{n}"})
+            results.append(f"file{n}")
+        else:
+            results.append(claimed[1].result(timeout=5)["fileId"])
+
+    threads = [threading.Thread(target=upload, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(uploads) == 1
+    assert results == [f"file{uploads[0]}"] * 8
+    assert len(index) == 1
+    # Each chunk table holds the hash exactly once
+    stored = value ^ (uploads[0] & 1)
+    for table, chunk in zip(index._tables, index._split(stored)):
+        assert table[chunk] == [stored]
+
+
+def test_released_claim_lets_waiters_upload():
+    index = PerceptualHashIndex()
+    value = 0x00FF00FF00FF00FF
+
+    assert index.claim(value, {}) is None
+    _, future = index.claim(value, {})
+    index.release(value)
+
+    assert future.result(timeout=1) is None
+    assert index.query(value) == []
+    assert index.claim(value, {}) is None
+
+
+def test_index_is_reloaded_after_a_partial_last_line(tmp_path):
+    path = tmp_path / "hashes.jsonl"
+    PerceptualHashIndex(str(path)).add(0x00FF00FF00FF00FF, {"fileId": "a"})
+    # A process killed mid-write
+    with open(path, "a") as f:
+        f.write('{"hash": "0f0f')
+
+    index = PerceptualHashIndex(str(path))
+    index.add(0x0F0F0F0F0F0F0F0F, {"fileId": "b"})
+
+    reloaded = PerceptualHashIndex(str(path))
+    assert len(reloaded) == 2
+    assert reloaded.nearest(0x0F0F0F0F0F0F0F0F)[2] == {"fileId": "b"}
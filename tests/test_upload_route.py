@@ -0,0 +1,80 @@
+import hashlib
+import importlib
+import io
+import os
+
+import pytest
+
+from src.flask_app import app
+# The package re-exports the blueprint under the module's name
+routes_module = importlib.import_module("src.flask_app.routes")
+
+
+@pytest.fixture
+def client(fake_drive):
+    return app.test_client()
+
+
+def _jpeg(size):
+    return b"\xff\xd8\xff\xe0" + os.urandom(size - 4)
+
+
+@pytest.mark.parametrize("size", [40 * 1024, 70 * 1024, 5 * 1024 * 1024])
+def test_multipart_upload_is_streamed_to_drive(client, fake_drive, size):
+    data = _jpeg(size)
+
+    response = client.post("/upload", data={
+        "file_name": "photo.jpg",
+        "folder_id": "folder",
+        "file": (io.BytesIO(data), "photo.jpg", "image/jpeg"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body["size"] == size
+    assert body["sha256"] == hashlib.sha256(data).hexdigest()
+    assert fake_drive.files[body["file_id"]]["data"] == data
+    assert fake_drive.files[body["file_id"]]["name"] == "photo.jpg"
+
+
+def test_raw_upload(client, fake_drive):
+    data = _jpeg(3 * 1024 * 1024)
+
+    response = client.post("/upload?file_name=raw.jpg&folder_id=folder", data=data, content_type="image/jpeg")
+
+    assert response.status_code == 200, response.get_json()
+    assert fake_drive.files[response.get_json()["file_id"]]["data"] == data
+
+
+def test_upload_over_limit_is_rejected(client, fake_drive, monkeypatch):
+    monkeypatch.setattr(routes_module, "UPLOAD_MAX_BYTES", 1024 * 1024)
+
+    response = client.post("/upload", data={
+        "file_name": "photo.jpg",
+        "folder_id": "folder",
+        "file": (io.BytesIO(_jpeg(2 * 1024 * 1024)), "photo.jpg", "image/jpeg"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 413
+    assert fake_drive.files == {}
+
+
+def test_non_image_is_rejected(client, fake_drive):
+    response = client.post("/upload", data={
+        "file_name": "notes.txt",
+        "folder_id": "folder",
+        "file": (io.BytesIO(b"just some text"), "notes.txt", "text/plain"),
+    }, content_type="multipart/form-data")
+
+    assert response.status_code == 415
+
+
+def test_server_side_paths_are_rejected(client, fake_drive):
+    response = client.post("/upload", json={
+        "file_name": "key.json",
+        "file_path": "credentials/service-account.json",
+        "folder_id": "folder",
+    })
+
+    assert response.status_code == 400
+    assert fake_drive.files == {}
@@ -0,0 +1,153 @@
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+from src.ml_module.benchmark import _finalize_predictions_dict, _random_preds
+from src.ml_module.utils import (
+    MIN_CLOTHING_SCORE, Detections, assign_to_people, calculate_area, finalize_detections, finalize_predictions,
+    iou, make_derivatives, nms, pairwise_iou
+)
+
+
+def _pred(label, score, xmin, ymin, xmax, ymax):
+    return {'score': score, 'label': label, 'box': {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}}
+
+
+def _dict_selection(preds):
+    # The dict version expects confident, area-sorted input
+    confident = [pred for pred in preds if pred['score'] >= MIN_CLOTHING_SCORE]
+    return _finalize_predictions_dict(sorted(confident, key=lambda x: calculate_area(x['box']), reverse=True))
+
+
+def test_finalize_matches_the_dict_implementation():
+    for seed in range(50):
+        preds = _random_preds(random.Random(seed).randint(0, 300), seed=seed)
+        expected = _dict_selection(preds)
+
+        assert finalize_predictions(preds) == expected
+        # The array version builds new dicts with the same contents
+        assert finalize_detections(Detections.from_preds(preds)) == {
+            key: None if pred is None else {**pred, 'score': np.float32(pred['score']).item()}
+            for key, pred in expected.items()
+        }
+
+
+def test_finalize_ignores_low_score_boxes():
+    large = {'score': 0.1, 'label': 'pants', 'box': {'xmin': 0, 'ymin': 0, 'xmax': 500, 'ymax': 500}}
+    small = {'score': 0.9, 'label': 'shorts', 'box': {'xmin': 0, 'ymin': 0, 'xmax': 50, 'ymax': 50}}
+
+    selected = finalize_predictions([large, small])
+
+    assert selected['pants'] is small
+    assert selected['head'] is None
+
+
+def test_pairwise_iou_matches_scalar_iou():
+    preds = _random_preds(40, seed=3)
+    boxes = Detections.from_preds(preds).boxes
+
+    overlaps = pairwise_iou(boxes, boxes[:10])
+
+    assert overlaps.shape == (40, 10)
+    for i, a in enumerate(preds):
+        for j, b in enumerate(preds[:10]):
+            assert overlaps[i, j] == pytest.approx(iou(a['box'], b['box']), abs=1e-6)
+
+
+def test_pairwise_iou_of_empty_boxes_is_zero():
+    point = np.array([[5, 5, 5, 5]], dtype=np.float32)
+
+    assert pairwise_iou(point, point)[0, 0] == 0
+
+
+def test_nms_keeps_the_best_box_per_class():
+    detections = Detections.from_preds([
+        _pred('shoe', 0.6, 0, 0, 100, 100),
+        _pred('shoe', 0.9, 5, 5, 105, 105),
+        # Same place, different class: never suppressed by the shoes
+        _pred('hat', 0.7, 0, 0, 100, 100),
+        # Same class, no overlap: kept
+        _pred('shoe', 0.8, 300, 300, 400, 400),
+    ])
+
+    keep = nms(detections.boxes, detections.scores, detections.category_ids, iou_threshold=0.5)
+
+    assert keep.tolist() == [1, 3, 2]
+
+
+def test_nms_of_nothing():
+    empty = Detections.from_preds([])
+
+    assert nms(empty.boxes, empty.scores, empty.category_ids).tolist() == []
+
+
+def test_detections_round_trip():
+    preds = [_pred('shoe', 0.5, 1, 2, 3, 4), _pred('hat', 0.25, 5, 6, 7, 8), _pred('shoe', 0.75, 0, 0, 9, 9)]
+    detections = Detections.from_preds(preds)
+
+    assert len(detections) == 3
+    assert detections.to_preds() == preds
+    assert detections.in_labels(['shoe']).tolist() == [True, False, True]
+    assert detections.select(np.array([2])).to_preds() == [preds[2]]
+
+
+def _box(xmin, ymin, xmax, ymax):
+    return {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax}
+
+
+def test_overlapping_people_get_the_right_clothes():
+    left, right = _box(0, 0, 100, 200), _box(80, 0, 160, 150)
+    # Mostly inside the right person, only a sliver inside the left one
+    shirt = _pred('shirt, blouse', 0.9, 85, 10, 155, 100)
+    # Inside both people; the tighter fit (higher IoU) wins
+    hat = _pred('hat', 0.9, 82, 0, 98, 20)
+    # Inside the left person only
+    pants = _pred('pants', 0.9, 10, 100, 70, 190)
+
+    people = assign_to_people([left, right], [shirt, hat, pants])
+
+    assert [person['human'] for person in people] == [left, right]
+    assert people[0]['clothes'] == [pants]
+    assert people[1]['clothes'] == [shirt, hat]
+
+
+def test_clothes_outside_every_person_are_dropped():
+    person = _box(0, 0, 100, 200)
+    outside = _pred('shoe', 0.9, 300, 300, 350, 350)
+    # Less than half of it inside the person
+    straddling = _pred('shoe', 0.9, 80, 150, 180, 200)
+
+    people = assign_to_people([person], [outside, straddling])
+
+    assert people == [{'human': person, 'clothes': []}]
+
+
+def test_assign_without_people_or_clothes():
+    assert assign_to_people([], [_pred('shoe', 0.9, 0, 0, 1, 1)]) == []
+    assert assign_to_people([_box(0, 0, 1, 1)], []) == [{'human': _box(0, 0, 1, 1), 'clothes': []}]
+
+
+def _decode(data):
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_derivatives_decode_at_their_sizes():
+    image = np.random.default_rng(0).integers(0, 256, (600, 300, 3), dtype=np.uint8)
+
+    derivatives = make_derivatives(image, (128, 512, 128))
+
+    assert sorted(derivatives) == [128, 512]
+    assert _decode(derivatives[512]).shape == (512, 256, 3)
+    assert _decode(derivatives[128]).shape == (128, 64, 3)
+    assert derivatives[128][8:12] == b"WEBP"
+
+
+def test_derivatives_are_never_upscaled():
+    image = np.zeros((100, 60, 3), dtype=np.uint8)
+
+    derivatives = make_derivatives(image, (64, 512))
+
+    assert _decode(derivatives[512]).shape == (100, 60, 3)
+    assert _decode(derivatives[64]).shape == (64, 38, 3)
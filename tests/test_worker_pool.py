@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from src.ml_module import worker_pool
+from src.ml_module.worker_pool import InferencePool, PoolBrokenException
+
+
+def test_pool_whose_workers_cannot_start_fails_its_jobs(monkeypatch):
+    monkeypatch.setattr(worker_pool, "STARTUP_BACKOFF", 0.01)
+    # An unknown pipeline option makes every worker die during startup, with or without torch installed
+    pool = InferencePool(num_workers=2, not_a_pipeline_option=True).start()
+    try:
+        started = time.monotonic()
+        future = pool.submit(b"image")
+        with pytest.raises(PoolBrokenException):
+            future.result(timeout=60)
+        assert time.monotonic() - started < 60
+        assert max(pool._startup_failures) == worker_pool.MAX_STARTUP_FAILURES
+
+        # Later jobs fail straight away
+        with pytest.raises(PoolBrokenException):
+            pool.submit(b"image").result(timeout=0)
+    finally:
+        pool.shutdown(wait=False)
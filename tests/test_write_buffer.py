@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from src.flask_app.write_buffer import FirestoreWriteBuffer
+from tests.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def make_buffer():
+    buffers = []
+
+    def make(db, **kwargs):
+        # A long interval keeps the background flusher out of the way
+        buffer = FirestoreWriteBuffer(db, flush_interval=kwargs.pop("flush_interval", 60), **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.close()
+
+
+def test_writes_are_committed_in_one_batch(make_buffer):
+    db = FakeFirestore()
+    buffer = make_buffer(db)
+
+    futures = [buffer.set(db.document(f"Images/{i}"), {"n": i}) for i in range(10)]
+    buffer.flush()
+
+    assert [future.result(timeout=1) for future in futures] == [True] * 10
+    assert len(db.commits) == 1
+    assert db.documents["Images/3"] == {"n": 3}
+
+
+def test_full_buffer_commits_without_waiting(make_buffer):
+    db = FakeFirestore()
+    buffer = make_buffer(db, max_batch_size=3)
+
+    futures = [buffer.set(db.document(f"Images/{i}"), {"n": i}) for i in range(3)]
+
+    assert all(future.done() for future in futures)
+    assert len(db.commits) == 1
+
+
+def test_background_flush(make_buffer):
+    db = FakeFirestore()
+    buffer = make_buffer(db, flush_interval=0.05)
+
+    future = buffer.set(db.document("Images/x"), {"isLiked": True})
+
+    assert future.result(timeout=2) is True
+    assert db.documents["Images/x"] == {"isLiked": True}
+
+
+def test_concurrent_flushes_commit_in_order(make_buffer):
+    # The first commit is slow, so an unserialized second flush would overtake it
+    db = FakeFirestore(commit_delays=[0.3])
+    buffer = make_buffer(db)
+    ref = db.document("Images/x")
+
+    created = buffer.set(ref, {"fileId": "x"})
+    first_flush = threading.Thread(target=buffer.flush)
+    first_flush.start()
+    time.sleep(0.05)
+    updated = buffer.update(ref, {"clothingItems": [1, 2]})
+    buffer.flush()
+    first_flush.join()
+
+    assert created.result(timeout=1) is True
+    assert updated.result(timeout=1) is True
+    assert db.documents["Images/x"] == {"fileId": "x", "clothingItems": [1, 2]}
+    assert db.commits == [[("set", "Images/x")], [("update", "Images/x")]]
+
+
+def test_rejected_write_fails_alone(make_buffer):
+    db = FakeFirestore()
+    buffer = make_buffer(db)
+
+    before = buffer.set(db.document("Images/a"), {"n": 1})
+    rejected = buffer.update(db.document("Images/a"), {})
+    after = buffer.set(db.document("Images/b"), {"n": 2})
+    buffer.flush()
+
+    assert before.result(timeout=1) is True
+    assert after.result(timeout=1) is True
+    with pytest.raises(ValueError):
+        rejected.result(timeout=1)
+
+
+def test_failed_batch_is_retried_write_by_write(make_buffer):
+    db = FakeFirestore()
+    buffer = make_buffer(db)
+
+    good = buffer.set(db.document("Images/a"), {"n": 1})
+    missing = buffer.update(db.document("Images/missing"), {"beenParsed": True})
+    buffer.flush()
+
+    assert good.result(timeout=1) is True
+    with pytest.raises(NotFound):
+        missing.result(timeout=1)
+    assert db.documents == {"Images/a": {"n": 1}}